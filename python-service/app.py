@@ -1,10 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import uvicorn
 from config import settings
-from routes import summarizer, quiz, flashcard
+from routes import summarizer, quiz, flashcard, analyze
+from services.executor import worker_pool, ServiceOverloaded
+from services.distractor_index import distractor_index
+from services.keyword_engine import keyword_engine
+from services.metrics import metrics, MetricsMiddleware
+from services.model_registry import registry, ModelUnavailable
+from services.request_context import DeadlineMiddleware
+import asyncio
 
 app = FastAPI(title="Smart Study Assistant AI Service")
 
@@ -17,6 +25,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Deadlines and client disconnects stop the request's remaining work
+app.add_middleware(DeadlineMiddleware)
+
+# Per-stage timings: Server-Timing header on every response, histograms on /metrics
+app.add_middleware(MetricsMiddleware)
+
+app.include_router(summarizer.router, prefix="/api")
+app.include_router(quiz.router, prefix="/api")
+app.include_router(flashcard.router, prefix="/api")
+app.include_router(analyze.router, prefix="/api")
+
+
+@app.exception_handler(ServiceOverloaded)
+async def service_overloaded_handler(request: Request, exc: ServiceOverloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(ModelUnavailable)
+async def model_unavailable_handler(request: Request, exc: ModelUnavailable):
+    return JSONResponse(status_code=503, content={"detail": exc.detail, "model": exc.name})
+
+@app.on_event("startup")
+async def start_model_warmup():
+    # Load models in the background so the server starts answering /health right away
+    if settings.MODEL_WARMUP:
+        app.state.warmup_task = asyncio.create_task(registry.warm_up())
+
+@app.on_event("shutdown")
+def shutdown_services():
+    worker_pool.shutdown()
+    keyword_engine.save()
+    distractor_index.save()
 
 @app.get("/")
 def read_root():
@@ -26,6 +69,19 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def readiness_check():
+    """Per-model load state; 503 until every model has loaded"""
+    ready = registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": registry.status()}
+    )
+
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
@@ -0,0 +1,142 @@
+"""
+Cold start with and without a model snapshot (snapshot.py).
+
+Each run starts a fresh process that imports the app, loads every
+registered model, then answers one summary and one quiz, and reports:
+import time, model load time (total and per model), time to the first
+results, and memory after loading (RSS, PSS and peak RSS). "hub" loads the
+models from the Hugging Face cache and the installed spaCy package, as the
+service does without a snapshot; "snapshot" loads the current snapshot.
+The medians over --repeats runs are shown side by side.
+
+Runs reuse the OS page cache, so after the first run the model files are
+read from memory. Pass --drop-caches (needs root) to drop the page cache
+before every run and time truly cold starts from disk.
+
+Run from the python-service directory, after `python snapshot.py export`:
+    python -m benchmarks.bench_cold_start --repeats 5 --output cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.bench_workers import memory_mb
+from benchmarks.run import make_corpus, peak_rss_mb
+
+SOURCES = {
+    "hub": {"MODEL_SNAPSHOT_ENABLED": "false"},
+    "snapshot": {"MODEL_SNAPSHOT_ENABLED": "true"},
+}
+METRICS = ("import_s", "load_s", "first_summary_s", "first_quiz_s", "rss_mb", "pss_mb", "peak_rss_mb")
+
+
+def run_child():
+    """Body of one measured process: prints a JSON result on stdout"""
+    start = time.perf_counter()
+    import app  # noqa: F401  registers the model loaders of every route
+    from services.model_registry import registry
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    registry.load_all()
+    load_s = time.perf_counter() - start
+    status = registry.status()
+    failed = {name: model["error"] for name, model in status.items() if model["state"] != "ready"}
+    memory = memory_mb([os.getpid()])
+
+    # Memory-mapped weights are paged in by the first forward pass, so the
+    # time to the first result is part of the cold start
+    text = make_corpus("sample", 2)
+    start = time.perf_counter()
+    registry.get("summarizer").summarize(text, "short")
+    first_summary_s = time.perf_counter() - start
+    start = time.perf_counter()
+    registry.get("quiz_generator").generate_quiz(text, num_questions=5)
+    first_quiz_s = time.perf_counter() - start
+
+    print(json.dumps({
+        "import_s": round(import_s, 3),
+        "load_s": round(load_s, 3),
+        "load_s_per_model": {name: model["load_seconds"] for name, model in status.items()},
+        "first_summary_s": round(first_summary_s, 3),
+        "first_quiz_s": round(first_quiz_s, 3),
+        "rss_mb": memory["rss_mb"],
+        "pss_mb": memory["pss_mb"],
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "failed": failed,
+    }))
+
+
+def drop_page_cache():
+    subprocess.run(["sync"], check=True)
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def run_source(source: str, args) -> List[Dict]:
+    runs = []
+    for _ in range(args.repeats):
+        if args.drop_caches:
+            drop_page_cache()
+        # Result caches would hide the first-request cost
+        env = dict(os.environ, MODEL_WARMUP="false", RESULT_CACHE_ENABLED="false", **SOURCES[source])
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_cold_start", "--child"],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if result["failed"]:
+            raise SystemExit(f"{source}: models failed to load: {result['failed']}")
+        runs.append(result)
+    return runs
+
+
+def summarize_runs(runs: List[Dict]) -> Dict:
+    summary = {metric: round(statistics.median(run[metric] for run in runs), 3) for metric in METRICS}
+    summary["load_s_per_model"] = {
+        name: round(statistics.median(run["load_s_per_model"][name] for run in runs), 3)
+        for name in runs[0]["load_s_per_model"]
+    }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=list(SOURCES))
+    parser.add_argument("--drop-caches", action="store_true", help="drop the OS page cache before each run (root)")
+    parser.add_argument("--output", help="write the per-run results and medians as JSON to this path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    runs = {}
+    for source in args.sources:
+        print(f"measuring {source} starts...", file=sys.stderr)
+        runs[source] = run_source(source, args)
+    medians = {source: summarize_runs(results) for source, results in runs.items()}
+
+    print(f"median of {args.repeats} run(s), page cache {'dropped' if args.drop_caches else 'warm'}")
+    print(f"{'':>28}" + "".join(f"{source:>12}" for source in medians))
+    for metric in METRICS:
+        print(f"{metric:>28}" + "".join(f"{medians[source][metric]:>12.2f}" for source in medians))
+    for name in next(iter(medians.values()))["load_s_per_model"]:
+        print(f"{'load_s ' + name:>28}" + "".join(
+            f"{medians[source]['load_s_per_model'][name]:>12.2f}" for source in medians))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"repeats": args.repeats, "drop_caches": args.drop_caches,
+                       "runs": runs, "medians": medians}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
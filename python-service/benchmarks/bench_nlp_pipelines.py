@@ -0,0 +1,94 @@
+"""
+Shared, task-specific spaCy pipeline versus the old per-generator copies.
+
+"separate" loads two full copies of the model (as the quiz module and the
+FlashcardGenerator used to) and runs every component for both tasks.
+"shared" loads one copy through NLPProvider and runs only the components
+each task declares. Each mode runs in its own subprocess and reports the
+RSS added by loading plus parse throughput per task.
+
+Run from the python-service directory:
+    python -m benchmarks.bench_nlp_pipelines --size-kb 8 --docs 50
+Pass --model to benchmark another installed pipeline or a pipeline directory.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_quiz import make_text
+from services.nlp_provider import SPACY_MODEL
+
+MODES = ("separate", "shared")
+TASKS = ("quiz", "flashcards")
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_worker(args):
+    before = rss_mb()
+    if args.mode == "separate":
+        import spacy
+        pipelines = {task: spacy.load(args.model) for task in TASKS}
+    else:
+        from services.nlp_provider import NLPProvider
+        provider = NLPProvider(args.model)
+        pipelines = {task: provider.pipeline_for(task) for task in TASKS}
+    loaded = rss_mb()
+
+    texts = [make_text(args.size_kb, seed=i) for i in range(args.docs)]
+    throughput = {}
+    for task, nlp in pipelines.items():
+        start = time.perf_counter()
+        for text in texts:
+            nlp(text)
+        elapsed = time.perf_counter() - start
+        throughput[task] = {
+            "docs_per_s": len(texts) / elapsed,
+            "kb_per_s": len(texts) * args.size_kb / elapsed,
+        }
+
+    json.dump({
+        "mode": args.mode,
+        "load_rss_mb": loaded - before,
+        "peak_rss_mb": rss_mb(),
+        "throughput": throughput,
+    }, sys.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=8)
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--model", default=SPACY_MODEL, help=f"spaCy pipeline name or path (default: {SPACY_MODEL})")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_worker(args)
+        return
+
+    results = {}
+    for mode in MODES:
+        command = [sys.executable, "-m", "benchmarks.bench_nlp_pipelines", "--mode", mode,
+                   "--size-kb", str(args.size_kb), "--docs", str(args.docs), "--model", args.model]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        # The result is the last line; anything the loaded code prints comes before it
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'mode':>9} {'load_mb':>8} {'peak_mb':>8} " + " ".join(f"{task + '_doc/s':>15}" for task in TASKS))
+    for mode in MODES:
+        result = results[mode]
+        rates = " ".join(f"{result['throughput'][task]['docs_per_s']:>15.1f}" for task in TASKS)
+        print(f"{mode:>9} {result['load_rss_mb']:>8.1f} {result['peak_rss_mb']:>8.1f} {rates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Quiz generation scaling benchmark.
+
+Times QuizGenerator.generate_quiz on synthetic lecture notes of growing size,
+both cold (spaCy parse included) and warm (parse served from the analysis
+cache, so only question generation is timed), and fits a log-log slope so
+super-linear behaviour shows up as an exponent well above 1.
+
+Run from the python-service directory:
+    python -m benchmarks.bench_quiz --sizes 4 16 64 256 --repeat 3
+"""
+import argparse
+import math
+import random
+import time
+from typing import List
+
+from services.analysis_cache import analysis_cache
+from services.quiz_generator import QuizGenerator
+
+PEOPLE = ["Marie Curie", "Isaac Newton", "Ada Lovelace", "Alan Turing", "Charles Darwin",
+          "Rosalind Franklin", "Niels Bohr", "Gregor Mendel", "Dmitri Mendeleev", "Louis Pasteur"]
+PLACES = ["Paris", "London", "Vienna", "Cambridge", "Copenhagen", "Berlin", "Boston", "Geneva"]
+ORGS = ["the Royal Society", "Harvard University", "the Pasteur Institute", "CERN", "MIT"]
+TEMPLATES = [
+    "{person} worked in {place} and joined {org} in {year}.",
+    "In {year}, {person} presented new results to {org}.",
+    "The laboratory in {place} was founded by {person}.",
+    "Students in {place} still study the notes {person} wrote in {year}.",
+    "{org} published a review of the theory proposed by {person}.",
+]
+
+
+def make_text(size_kb: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size_kb * 1024:
+        sentence = rng.choice(TEMPLATES).format(
+            person=rng.choice(PEOPLE),
+            place=rng.choice(PLACES),
+            org=rng.choice(ORGS),
+            year=rng.randint(1800, 1990),
+        )
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)
+
+
+def time_call(fn, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def slope(sizes: List[int], timings: List[float]) -> float:
+    """Least-squares slope of log(time) against log(size)"""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in timings]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    den = sum((x - mean_x) ** 2 for x in xs)
+    return num / den if den else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 16, 64, 256], help="document sizes in KB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=20)
+    args = parser.parse_args()
+
+    generator = QuizGenerator()
+    cold, warm = [], []
+
+    print(f"{'size_kb':>8} {'cold_s':>10} {'warm_s':>10} {'warm_ms/kb':>11}")
+    for size_kb in args.sizes:
+        text = make_text(size_kb)
+
+        def run_cold():
+            analysis_cache.clear()
+            generator.generate_quiz(text, num_questions=args.questions)
+
+        def run_warm():
+            generator.generate_quiz(text, num_questions=args.questions)
+
+        cold.append(time_call(run_cold, args.repeat))
+        run_warm()
+        warm.append(time_call(run_warm, args.repeat))
+        print(f"{size_kb:>8} {cold[-1]:>10.3f} {warm[-1]:>10.4f} {warm[-1] * 1000 / size_kb:>11.3f}")
+
+    if len(args.sizes) > 1:
+        print(f"\nscaling exponent (cold): {slope(args.sizes, cold):.2f}")
+        print(f"scaling exponent (warm): {slope(args.sizes, warm):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Throughput versus worker count for the prefork server (serve.py).
+
+For each worker count the server is started on a free port, the benchmark
+waits for /ready, then a fixed number of client threads send requests to
+one endpoint for a fixed time. The report shows requests per second,
+p50/p95 latency, and the memory of the server processes: the sum of their
+RSS counts shared model pages once per worker, while PSS splits shared
+pages between the processes sharing them, so the gap between the two is
+what copy-on-write sharing saves.
+
+Caches are disabled in the server, since every request sends the same
+document. Run it on the target machine with the real models installed:
+on one core, extra workers only compete for the CPU.
+
+Run from the python-service directory:
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --endpoint quiz --concurrency 16
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List
+
+from benchmarks.compare_backends import percentile
+from benchmarks.run import make_corpus
+
+ENDPOINTS = {
+    "summarize": ("/api/summarize", lambda text: {"text": text, "length": "short"}),
+    "quiz": ("/api/quiz/generate", lambda text: {"text": text, "num_questions": 10}),
+    "flashcards": ("/api/flashcards/generate", lambda text: {"text": text, "count": 10}),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} was not ready after {timeout:.0f}s")
+
+
+def process_tree(root: int) -> List[int]:
+    """root and its direct children, read from /proc"""
+    pids = [root]
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid is the second field after the parenthesised command name
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == root:
+            pids.append(int(entry))
+    return pids
+
+
+def memory_mb(pids: List[int]) -> Dict[str, float]:
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    name, value = line.split(":", 1)[0], line.split(":", 1)[-1]
+                    if name in ("Rss", "Pss"):
+                        totals[f"{name.lower()}_mb"] += int(value.split()[0]) / 1024
+        except OSError:
+            continue
+    return {key: round(value, 1) for key, value in totals.items()}
+
+
+def load(url: str, body: bytes, concurrency: int, seconds: float) -> Dict:
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client():
+        while time.monotonic() < stop_at:
+            request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=120) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, ConnectionError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_s": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+    }
+
+
+def run_case(workers: int, args) -> Dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        # Every request sends the same document, so caches would serve them all
+        # after the first and leave the models idle
+        env=dict(os.environ, MODEL_WARMUP="true", RESULT_CACHE_ENABLED="false", ANALYSIS_CACHE_MAX_MB="0"),
+    )
+    try:
+        wait_ready(base_url, args.startup_timeout)
+        path, make_body = ENDPOINTS[args.endpoint]
+        body = json.dumps(make_body(make_corpus(args.corpus, args.size))).encode("utf-8")
+        url = f"{base_url}{path}"
+        # Warm-up pass so every worker has run the endpoint once
+        load(url, body, args.concurrency, min(args.seconds, 5))
+        result = load(url, body, args.concurrency, args.seconds)
+        result.update(memory_mb(process_tree(server.pid)))
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="quiz")
+    parser.add_argument("--corpus", choices=("synthetic", "sample"), default="sample")
+    parser.add_argument("--size", type=int, default=8, help="document size in KB")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads sending requests")
+    parser.add_argument("--seconds", type=float, default=30.0, help="measured load time per worker count")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    for workers in args.workers:
+        print(f"running with {workers} worker(s)...", file=sys.stderr)
+        results[workers] = run_case(workers, args)
+
+    print(f"{args.endpoint}, {args.size} KB {args.corpus} documents, {args.concurrency} clients, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'req/s':>8} {'speedup':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7} "
+          f"{'RSS MB':>9} {'PSS MB':>9}")
+    base = results[args.workers[0]]["requests_per_s"] or None
+    for workers, result in results.items():
+        speedup = f"{result['requests_per_s'] / base:.2f}x" if base else "-"
+        print(f"{workers:>8} {result['requests_per_s']:>8.2f} {speedup:>8} {result['p50_ms'] or 0:>9.1f} "
+              f"{result['p95_ms'] or 0:>9.1f} {result['errors']:>7} {result['rss_mb']:>9.1f} {result['pss_mb']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"endpoint": args.endpoint, "cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Compare summarizer inference backends against fp32.
+
+Each backend runs in its own subprocess (so peak RSS is measured per
+backend) over every .txt file in a local corpus directory. The report shows
+mean and p95 latency per document, peak RSS, and ROUGE-1/2/L F1 of each
+backend's summaries against the fp32 summaries.
+
+Works fully offline: point --model at a locally saved seq2seq model and
+hub lookups are disabled in the workers. benchmarks.tiny_model saves a tiny
+random BART for checking the harness without any download.
+
+Run from the python-service directory:
+    python -m benchmarks.compare_backends --model ./models/bart-large-cnn --corpus ./corpus
+    python -m benchmarks.tiny_model ./models/tiny-bart --corpus benchmarks/samples
+    python -m benchmarks.compare_backends --model ./models/tiny-bart --corpus benchmarks/samples
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+from services.inference_backend import BACKENDS
+
+
+def ngrams(tokens: List[str], n: int) -> Counter:
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def f1(overlap: int, candidate_total: int, reference_total: int) -> float:
+    if not overlap or not candidate_total or not reference_total:
+        return 0.0
+    precision = overlap / candidate_total
+    recall = overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def lcs_length(a: List[str], b: List[str]) -> int:
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def rouge(candidate: str, reference: str) -> Dict[str, float]:
+    """ROUGE-1/2/L F1 on lowercased whitespace tokens"""
+    cand = candidate.lower().split()
+    ref = reference.lower().split()
+    scores = {}
+    for n in (1, 2):
+        c, r = ngrams(cand, n), ngrams(ref, n)
+        scores[f"rouge{n}"] = f1(sum((c & r).values()), sum(c.values()), sum(r.values()))
+    scores["rougeL"] = f1(lcs_length(cand, ref), len(cand), len(ref))
+    return scores
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_worker(args):
+    """Load one backend, summarize the corpus, print a JSON result on stdout"""
+    from transformers import AutoTokenizer, pipeline
+    from services.inference_backend import load_seq2seq
+
+    load_start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(args.model, local_files_only=True)
+    model, backend = load_seq2seq(args.model, args.backend, local_files_only=True)
+    summarizer = pipeline("summarization", model=model, tokenizer=tokenizer, device=-1)
+    load_seconds = time.perf_counter() - load_start
+
+    summaries, latencies = [], []
+    for path in sorted(glob.glob(os.path.join(args.corpus, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        for attempt in range(args.repeat):
+            start = time.perf_counter()
+            output = summarizer(text, max_length=args.max_length, min_length=args.min_length,
+                                do_sample=False, truncation=True)
+            latencies.append(time.perf_counter() - start)
+        summaries.append(output[0]["summary_text"])
+
+    json.dump({
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "latencies": latencies,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "summaries": summaries,
+    }, sys.stdout)
+
+
+def run_backend(args, backend: str) -> Dict:
+    env = dict(os.environ, HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+    command = [
+        sys.executable, "-m", "benchmarks.compare_backends", "--worker",
+        "--backend", backend, "--model", args.model, "--corpus", args.corpus,
+        "--max-length", str(args.max_length), "--min-length", str(args.min_length),
+        "--repeat", str(args.repeat),
+    ]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    # The result is the last line; anything the loaded code prints comes before it
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="path to a locally saved seq2seq model")
+    parser.add_argument("--corpus", required=True, help="directory of .txt documents")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--max-length", type=int, default=100)
+    parser.add_argument("--min-length", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", help="also write the full report to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", default="fp32", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    backends = ["fp32"] + [b for b in args.backends if b != "fp32"]
+    results = {backend: run_backend(args, backend) for backend in backends}
+    reference = results["fp32"]["summaries"]
+
+    report = []
+    print(f"{'backend':>8} {'used':>6} {'mean_s':>8} {'p95_s':>8} {'rss_mb':>8} {'rouge1':>7} {'rouge2':>7} {'rougeL':>7}")
+    for backend in backends:
+        result = results[backend]
+        scores = [rouge(c, r) for c, r in zip(result["summaries"], reference)]
+        mean = {k: sum(s[k] for s in scores) / len(scores) if scores else 0.0 for k in ("rouge1", "rouge2", "rougeL")}
+        latencies = result["latencies"]
+        row = {
+            "backend": backend,
+            "used": result["backend"],
+            "mean_latency_s": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p95_latency_s": percentile(latencies, 95),
+            "peak_rss_mb": result["peak_rss_mb"],
+            "load_seconds": result["load_seconds"],
+            **mean,
+        }
+        report.append(row)
+        print(f"{backend:>8} {row['used']:>6} {row['mean_latency_s']:>8.3f} {row['p95_latency_s']:>8.3f} "
+              f"{row['peak_rss_mb']:>8.0f} {row['rouge1']:>7.3f} {row['rouge2']:>7.3f} {row['rougeL']:>7.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
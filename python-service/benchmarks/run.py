@@ -0,0 +1,334 @@
+"""
+Microbenchmark suite for the python-service hot paths.
+
+Every stage runs in its own subprocess, so its peak RSS is measured in
+isolation. It runs over a synthetic corpus (benchmarks.bench_quiz.make_text)
+and a sample corpus (the .txt files in benchmarks/samples, tiled to size),
+from 1 KB up to 1 MB. For each stage, corpus and size the report shows
+p50/p95/p99 latency and throughput. Results are written as JSON.
+
+The summarize stage uses a stub model by default: the real tokenizer and
+chunker are used, but each chunk's "summary" is its first sentence. Pass
+--summary-model with the path of a tiny locally saved seq2seq model to time
+real generation instead.
+
+With --baseline, the run is compared against a stored result file. The
+exit status is 1 when a stage's p50 latency or peak RSS regressed by more
+than the tolerance, so the suite can gate changes:
+
+    python -m benchmarks.run --output bench.json --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --output bench.json --baseline benchmarks/baseline.json
+
+Run from the python-service directory.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.bench_quiz import make_text
+from benchmarks.compare_backends import percentile
+
+STAGES = ("preprocess", "chunking", "spacy_parse", "quiz", "flashcards", "flashcards_streaming", "keywords",
+          "summarize_extractive", "summarize")
+CORPORA = ("synthetic", "sample")
+DEFAULT_SIZES = [1, 4, 16, 64, 256, 1024]
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), "samples")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_sample_text(size_kb: int, samples_dir: str = SAMPLES_DIR) -> str:
+    """Concatenate the sample documents, repeating them until the text reaches size_kb"""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(samples_dir, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read().strip())
+    if not texts:
+        raise SystemExit(f"No sample documents in {samples_dir}")
+
+    target = size_kb * 1024
+    parts = []
+    length = 0
+    while length < target:
+        text = texts[len(parts) % len(texts)]
+        parts.append(text)
+        length += len(text) + 2
+    return "\n\n".join(parts)[:target]
+
+
+def make_corpus(corpus: str, size_kb: int) -> str:
+    return make_text(size_kb) if corpus == "synthetic" else make_sample_text(size_kb)
+
+
+def stub_summarizer(model: str = None):
+    """
+    TextSummarizer that uses the real tokenizer and chunker, with a stub model
+    that returns each chunk's first sentence. If model is given, that locally
+    saved model runs instead.
+    """
+    from config import settings
+    from services.chunker import SENTENCE_PATTERN
+    from services.text_summarizer import TextSummarizer
+
+    if model:
+        settings.SUMMARIZATION_MODEL = model
+        return TextSummarizer()
+
+    class StubSummarizer(TextSummarizer):
+        def __init__(self):
+            from transformers import AutoTokenizer
+            from services.chunker import SentenceChunker
+            self.model_name = "stub"
+            self.backend = "stub"
+            self.tokenizer = AutoTokenizer.from_pretrained(settings.SUMMARIZATION_MODEL, local_files_only=True)
+            self.chunker = SentenceChunker(self.tokenizer)
+
+        def _summarize_batch(self, chunks: List[str], length_params: dict) -> List[str]:
+            summaries = []
+            for chunk in chunks:
+                match = SENTENCE_PATTERN.search(chunk)
+                summaries.append(match.group(0) if match else "")
+            return summaries
+
+    return StubSummarizer()
+
+
+def build_stage(stage: str, args) -> Callable[[str], object]:
+    """Load what a stage needs and return the function to time on one document"""
+    if stage == "preprocess":
+        from services.text_summarizer import TextSummarizer
+        # preprocess_text does not touch the model, so skip loading it
+        return lambda text: TextSummarizer.preprocess_text(None, text)
+
+    if stage == "chunking":
+        summarizer = stub_summarizer()
+        return lambda text: summarizer.chunker.chunk(summarizer.preprocess_text(text))
+
+    if stage == "spacy_parse":
+        from services.nlp_provider import get_pipeline
+        # Call the pipeline directly so the analysis cache is not involved
+        nlp = get_pipeline("quiz")
+        return nlp
+
+    if stage == "quiz":
+        from services.analysis_cache import analysis_cache
+        from services.quiz_generator import QuizGenerator
+        generator = QuizGenerator()
+
+        def run(text):
+            analysis_cache.clear()
+            return generator.generate_quiz(text, num_questions=10)
+        return run
+
+    if stage == "flashcards":
+        from services.analysis_cache import analysis_cache
+        from services.flashcard_generator import FlashcardGenerator
+        generator = FlashcardGenerator()
+
+        def run(text):
+            analysis_cache.clear()
+            return generator.generate_flashcards(text, num_cards=10)
+        return run
+
+    if stage == "flashcards_streaming":
+        from services.flashcard_generator import FlashcardGenerator
+        generator = FlashcardGenerator()
+        return lambda text: generator.generate_flashcards_streaming(text, num_cards=10, seed=0)
+
+    if stage == "keywords":
+        from services.keyword_engine import KeywordEngine
+        # An unpersisted engine, so runs do not touch the service's IDF table
+        engine = KeywordEngine(path=None)
+        return lambda text: engine.extract(text, 10)
+
+    if stage == "summarize_extractive":
+        from services.extractive_summarizer import ExtractiveSummarizer
+        summarizer = ExtractiveSummarizer()
+        return lambda text: summarizer.summarize(text, "medium")
+
+    if stage == "summarize":
+        summarizer = stub_summarizer(args.summary_model)
+        return lambda text: summarizer.summarize(text, "medium")
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def measure(fn: Callable[[str], object], text: str, repeat: int, max_seconds: float) -> Dict:
+    fn(text)  # warm-up
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat:
+        start = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - start)
+        if time.perf_counter() - started > max_seconds:
+            break
+    mean = sum(timings) / len(timings)
+    return {
+        "runs": len(timings),
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "mb_per_s": len(text.encode("utf-8")) / mean / (1024 * 1024),
+    }
+
+
+def run_stage(args):
+    """Run one stage over every corpus and size and print a JSON result on stdout"""
+    # Whatever the loaded code prints goes to stderr, keeping stdout for the result
+    with contextlib.redirect_stdout(sys.stderr):
+        result = _run_stage(args)
+    print(json.dumps(result))
+
+
+def _run_stage(args) -> Dict:
+    baseline_rss = peak_rss_mb()
+    load_start = time.perf_counter()
+    fn = build_stage(args.stage, args)
+    result = {
+        "stage": args.stage,
+        "load_s": time.perf_counter() - load_start,
+        "cases": {},
+    }
+
+    for corpus in args.corpora:
+        for size_kb in args.sizes:
+            text = make_corpus(corpus, size_kb)
+            try:
+                case = measure(fn, text, args.repeat, args.max_seconds)
+            except Exception as e:
+                # e.g. spaCy's max_length on the largest documents
+                case = {"error": f"{type(e).__name__}: {str(e).splitlines()[0][:200]}"}
+            result["cases"][f"{corpus}/{size_kb}kb"] = case
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["rss_before_load_mb"] = baseline_rss
+    return result
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, rss_tolerance: float) -> List[str]:
+    """Return a line for every stage/case that regressed beyond the tolerances"""
+    regressions = []
+    for stage, result in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or "error" in base:
+            continue
+        if "error" in result:
+            regressions.append(f"{stage}: failed ({result['error']})")
+            continue
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_tolerance):
+            regressions.append(
+                f"{stage}: peak RSS {base['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MB"
+            )
+        for case, stats in result["cases"].items():
+            base_stats = base["cases"].get(case)
+            if not base_stats or "error" in base_stats:
+                continue
+            if "error" in stats:
+                regressions.append(f"{stage} {case}: failed ({stats['error']})")
+                continue
+            if stats["p50_ms"] > base_stats["p50_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{stage} {case}: p50 {base_stats['p50_ms']:.2f} -> {stats['p50_ms']:.2f} ms"
+                )
+    return regressions
+
+
+def print_report(report: Dict, baseline: Dict = None):
+    print(f"{'stage':>12} {'case':>16} {'p50_ms':>10} {'p95_ms':>10} {'p99_ms':>10} {'MB/s':>8} {'vs_base':>8}")
+    for stage, result in report["stages"].items():
+        if "error" in result:
+            print(f"{stage:>12} failed: {result['error']}")
+            continue
+        base_cases = (baseline or {}).get("stages", {}).get(stage, {}).get("cases", {})
+        for case, stats in result["cases"].items():
+            if "error" in stats:
+                print(f"{stage:>12} {case:>16} {stats['error']}")
+                continue
+            base = base_cases.get(case, {})
+            ratio = f"{stats['p50_ms'] / base['p50_ms']:.2f}x" if base.get("p50_ms") else "-"
+            print(f"{stage:>12} {case:>16} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f} "
+                  f"{stats['p99_ms']:>10.2f} {stats['mb_per_s']:>8.2f} {ratio:>8}")
+        print(f"{stage:>12} {'peak RSS':>16} {result['peak_rss_mb']:>10.1f} MB, load {result['load_s']:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--corpora", nargs="+", choices=CORPORA, default=list(CORPORA))
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="document sizes in KB")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--max-seconds", type=float, default=30.0,
+                        help="stop repeating a case once it has run this long (at least one run is kept)")
+    parser.add_argument("--summary-model", help="locally saved seq2seq model for the summarize stage (default: stub)")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="result file to compare against; regressions set exit status 1")
+    parser.add_argument("--save-baseline", help="also write this run's results to this path")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p50 slowdown, as a fraction")
+    parser.add_argument("--rss-tolerance", type=float, default=0.10, help="allowed peak RSS growth, as a fraction")
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage(args)
+        return
+
+    env = dict(os.environ, HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1", TOKENIZERS_PARALLELISM="false")
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "summary_model": args.summary_model or "stub",
+        "stages": {},
+    }
+    for stage in args.stages:
+        command = [sys.executable, "-m", "benchmarks.run", "--stage", stage,
+                   "--corpora", *args.corpora, "--sizes", *map(str, args.sizes),
+                   "--repeat", str(args.repeat), "--max-seconds", str(args.max_seconds)]
+        if args.summary_model:
+            command += ["--summary-model", args.summary_model]
+        print(f"running {stage}...", file=sys.stderr)
+        completed = subprocess.run(command, capture_output=True, text=True, env=env)
+        if completed.returncode != 0:
+            report["stages"][stage] = {"error": (completed.stderr.strip().splitlines() or ["failed"])[-1]}
+            continue
+        # The result is the last line, after anything printed below Python (e.g. by native libraries)
+        report["stages"][stage] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if baseline:
+        regressions = compare(report, baseline, args.tolerance, args.rss_tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
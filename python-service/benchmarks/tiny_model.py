@@ -0,0 +1,63 @@
+"""
+Save a tiny, randomly initialized BART for offline runs of the benchmarks.
+
+The model has the summarizer's architecture at a fraction of the size, with
+a word-level tokenizer built from a local corpus, so compare_backends can be
+exercised without any hub download. Its summaries are noise: use it to
+check that the harness works, not to compare backends.
+
+Run from the python-service directory:
+    python -m benchmarks.tiny_model ./models/tiny-bart --corpus benchmarks/samples
+    python -m benchmarks.compare_backends --model ./models/tiny-bart --corpus benchmarks/samples
+"""
+import argparse
+import glob
+import os
+
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>"]
+MAX_POSITIONS = 256
+
+
+def save_tiny_bart(path: str, corpus: str, d_model: int = 32, layers: int = 1, seed: int = 0):
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import BartConfig, BartForConditionalGeneration, PreTrainedTokenizerFast, set_seed
+
+    words = set()
+    for file in sorted(glob.glob(os.path.join(corpus, "*.txt"))):
+        with open(file, encoding="utf-8") as f:
+            words.update(pre_token for pre_token, _ in pre_tokenizers.Whitespace().pre_tokenize_str(f.read()))
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS + sorted(words))}
+
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", special_tokens=[("<s>", vocab["<s>"]), ("</s>", vocab["</s>"])]
+    )
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<s>", eos_token="</s>", pad_token="<pad>", unk_token="<unk>",
+        model_max_length=MAX_POSITIONS,
+    )
+
+    config = BartConfig(
+        vocab_size=len(vocab), d_model=d_model, encoder_layers=layers, decoder_layers=layers,
+        encoder_attention_heads=2, decoder_attention_heads=2,
+        encoder_ffn_dim=2 * d_model, decoder_ffn_dim=2 * d_model, max_position_embeddings=MAX_POSITIONS,
+        bos_token_id=vocab["<s>"], pad_token_id=vocab["<pad>"], eos_token_id=vocab["</s>"],
+        decoder_start_token_id=vocab["</s>"], forced_bos_token_id=vocab["<s>"],
+    )
+    set_seed(seed)
+    BartForConditionalGeneration(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="directory to save the model and tokenizer to")
+    parser.add_argument("--corpus", required=True, help="directory of .txt documents to build the vocabulary from")
+    args = parser.parse_args()
+    save_tiny_bart(args.path, args.corpus)
+    print(f"Saved a tiny random BART to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
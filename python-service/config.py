@@ -6,10 +6,22 @@ load_dotenv()
 class Settings:
     PORT = int(os.getenv("PORT", 8000))
     MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "./models")
+    # Models and NLTK data must be installed ahead of time unless this is set
+    ALLOW_MODEL_DOWNLOAD = os.getenv("ALLOW_MODEL_DOWNLOAD", "false").lower() == "true"
+    # Local model snapshots written by snapshot.py (safetensors weights, tokenizer
+    # and spaCy pipeline); loaded instead of the hub / package copies when present.
+    # MODEL_SNAPSHOT_VERSION pins a snapshot, otherwise the current one is used
+    MODEL_SNAPSHOT_ENABLED = os.getenv("MODEL_SNAPSHOT_ENABLED", "true").lower() == "true"
+    MODEL_SNAPSHOT_DIR = os.getenv("MODEL_SNAPSHOT_DIR")  # defaults to MODEL_CACHE_DIR/snapshots
+    MODEL_SNAPSHOT_VERSION = os.getenv("MODEL_SNAPSHOT_VERSION", "")
+    # Load all models in the background at startup instead of on first request
+    MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
     
     # Model configurations
     SUMMARIZATION_MODEL = "facebook/bart-large-cnn"
     QA_MODEL = "deepset/roberta-base-squad2"
+    # CPU inference backend for the summarizer: fp32, int8 (dynamic quantization) or bf16
+    SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "fp32")
     
     # Summary length configurations
     SUMMARY_LENGTHS = {
@@ -18,4 +30,86 @@ class Settings:
         "long": {"max_length": 400, "min_length": 100}
     }
 
+    # mode="auto" on /summarize uses the extractive summarizer for inputs shorter
+    # than this many words, or when a BART result would take longer than
+    # SUMMARY_AUTO_MAX_WAIT_S to start (or longer than the request has left)
+    SUMMARY_AUTO_EXTRACTIVE_WORDS = int(os.getenv("SUMMARY_AUTO_EXTRACTIVE_WORDS", 150))
+    SUMMARY_AUTO_MAX_WAIT_S = float(os.getenv("SUMMARY_AUTO_MAX_WAIT_S", 5))
+
+    # Sentence-aligned chunking for the summarizer (BART accepts 1024 tokens)
+    SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 1024))
+    SUMMARY_CHUNK_OVERLAP_SENTENCES = int(os.getenv("SUMMARY_CHUNK_OVERLAP_SENTENCES", 0))
+
+    # Upper bound on summaries joined per reduce step in hierarchical mode
+    SUMMARY_REDUCE_GROUP_SIZE = int(os.getenv("SUMMARY_REDUCE_GROUP_SIZE", 8))
+
+    # Cross-request micro-batching of summarizer calls
+    SUMMARY_BATCH_MAX_SIZE = int(os.getenv("SUMMARY_BATCH_MAX_SIZE", 8))
+    SUMMARY_BATCH_MAX_WAIT_MS = float(os.getenv("SUMMARY_BATCH_MAX_WAIT_MS", 20))
+
+    # Worker pool for blocking model calls and per-endpoint pending queues
+    WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", 2))
+    QUEUE_LIMIT_DEFAULT = int(os.getenv("QUEUE_LIMIT_DEFAULT", 16))
+    QUEUE_LIMITS = {
+        "summarize": int(os.getenv("QUEUE_LIMIT_SUMMARIZE", 16)),
+        "quiz": int(os.getenv("QUEUE_LIMIT_QUIZ", 16)),
+        "flashcards": int(os.getenv("QUEUE_LIMIT_FLASHCARDS", 16)),
+        # Each /analyze request runs every generator, so fewer are let in
+        "analyze": int(os.getenv("QUEUE_LIMIT_ANALYZE", 8)),
+    }
+    # Kept below the Node client's 30s axios timeout
+    QUEUE_TIMEOUT_S = float(os.getenv("QUEUE_TIMEOUT_S", 20))
+
+    # Prefork server (serve.py): worker processes, and torch threads per worker
+    # (0 = split the CPU cores evenly between workers)
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 1))
+    SERVER_THREADS_PER_WORKER = int(os.getenv("SERVER_THREADS_PER_WORKER", 0))
+
+    # Time budget for a request that does not send X-Request-Deadline-Ms (0 = none)
+    REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", 120))
+    # Rough seconds of work per KB of input for each task, used to run cheap
+    # requests ahead of book-length ones in the worker and batch queues
+    TASK_COST_S_PER_KB = {
+        "summarize": float(os.getenv("TASK_COST_S_PER_KB_SUMMARIZE", 0.2)),
+        "quiz": float(os.getenv("TASK_COST_S_PER_KB_QUIZ", 0.02)),
+        "flashcards": float(os.getenv("TASK_COST_S_PER_KB_FLASHCARDS", 0.02)),
+        "analyze": float(os.getenv("TASK_COST_S_PER_KB_ANALYZE", 0.25)),
+    }
+    TASK_COST_S_PER_KB_DEFAULT = float(os.getenv("TASK_COST_S_PER_KB_DEFAULT", 0.05))
+
+    # Persistent cache of summarization results
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH")  # defaults to MODEL_CACHE_DIR/summary_cache.sqlite3
+    RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", 256))
+    RESULT_CACHE_TTL_S = int(os.getenv("RESULT_CACHE_TTL_S", 7 * 24 * 3600))
+
+    # spaCy nlp.pipe settings for batch endpoints
+    SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", 16))
+    SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", 1))
+    # Maximum number of documents accepted by one batch request
+    BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", 64))
+    # Largest file accepted by /summarize/upload
+    UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", 50))
+
+    # Streaming flashcards stop parsing after this many good candidates per requested card (0 = read everything)
+    FLASHCARD_OVERSAMPLE = int(os.getenv("FLASHCARD_OVERSAMPLE", 3))
+
+    # spaCy analysis cache shared by quiz and flashcard generation
+    ANALYSIS_CACHE_MAX_MB = int(os.getenv("ANALYSIS_CACHE_MAX_MB", 64))
+    ANALYSIS_CACHE_DISK = os.getenv("ANALYSIS_CACHE_DISK", "false").lower() == "true"
+    ANALYSIS_CACHE_DISK_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_DISK_MAX_ENTRIES", 5000))
+
+    # Keyword engine: size of the hashed document-frequency table and how many
+    # processed documents to buffer before it is written to MODEL_CACHE_DIR
+    KEYWORD_HASH_FEATURES = int(os.getenv("KEYWORD_HASH_FEATURES", 2 ** 20))
+    KEYWORD_SAVE_EVERY = int(os.getenv("KEYWORD_SAVE_EVERY", 50))
+    # Digests of documents already counted, so repeats do not skew the IDF
+    KEYWORD_SEEN_MAX = int(os.getenv("KEYWORD_SEEN_MAX", 100000))
+
+    # Distractor index for quiz options: hashed character n-gram width, entities
+    # kept per label, and new entities to buffer before writing it to MODEL_CACHE_DIR
+    DISTRACTOR_HASH_FEATURES = int(os.getenv("DISTRACTOR_HASH_FEATURES", 2 ** 14))
+    DISTRACTOR_MAX_PER_LABEL = int(os.getenv("DISTRACTOR_MAX_PER_LABEL", 2000))
+    DISTRACTOR_SAVE_EVERY = int(os.getenv("DISTRACTOR_SAVE_EVERY", 200))
+
 settings = Settings()
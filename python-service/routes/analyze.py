@@ -0,0 +1,198 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+import asyncio
+import json
+from services.analysis_cache import analysis_cache
+from services.executor import worker_pool, ServiceOverloaded
+from services.keyword_engine import keyword_engine
+from services.metrics import stage
+from services.model_registry import registry, ModelUnavailable
+from services.request_context import RequestCancelled
+from services.streaming import AdmittedStreamingResponse
+from utils.document import Document
+from routes.summarizer import SummarizeResponse, build_summary_response, choose_engine, summarize_document
+from routes.quiz import QuizGenerateResponse
+from routes.flashcard import FlashcardGenerateResponse
+
+router = APIRouter()
+
+ARTIFACTS = ("summary", "quiz", "flashcards", "keywords")
+# Keywords shown with the summary, as /summarize returns
+SUMMARY_KEYWORDS = 5
+
+class AnalyzeRequest(BaseModel):
+    text: str
+    artifacts: List[str] = list(ARTIFACTS)
+    # Summary options, as for /summarize
+    length: str = "medium"
+    mode: str = "standard"
+    # Quiz options, as for /quiz/generate
+    num_questions: int = 10
+    difficulty: str = "medium"
+    question_types: List[str] = ["multiple_choice", "true_false"]
+    # Flashcard options, as for /flashcards/generate
+    count: int = 10
+    seed: Optional[int] = None
+    num_keywords: int = 10
+    # Send each artifact as an NDJSON event as soon as it is ready
+    stream: bool = False
+
+class AnalyzeResponse(BaseModel):
+    summary: Optional[SummarizeResponse] = None
+    quiz: Optional[QuizGenerateResponse] = None
+    flashcards: Optional[FlashcardGenerateResponse] = None
+    keywords: Optional[List[str]] = None
+    # Artifacts that could not be produced, with the reason
+    errors: Dict[str, str] = {}
+
+def _validate(request: AnalyzeRequest):
+    request.artifacts = list(dict.fromkeys(request.artifacts))
+    unknown = [name for name in request.artifacts if name not in ARTIFACTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown artifacts: {', '.join(unknown)}")
+    if not request.artifacts:
+        raise HTTPException(status_code=400, detail="No artifacts requested")
+    if not request.text or len(request.text.strip()) < 50:
+        raise HTTPException(status_code=400, detail="Text too short for analysis")
+
+def _start_artifacts(request: AnalyzeRequest) -> Dict[str, asyncio.Future]:
+    """
+    Start a task per requested artifact. The shared work runs once: the text
+    is normalized into one Document, keywords are extracted in one pass (so
+    the document is added to the keyword statistics once), and quiz and
+    flashcards share one spaCy parse. The generators then run in parallel.
+    """
+    requested = set(request.artifacts)
+    document = Document(request.text)
+    tasks: Dict[str, asyncio.Future] = {}
+
+    async def extract_keywords():
+        with stage("keywords"):
+            return await worker_pool.submit(
+                keyword_engine.extract, request.text, max(request.num_keywords, SUMMARY_KEYWORDS)
+            )
+
+    keywords = asyncio.ensure_future(extract_keywords())
+
+    async def parse():
+        # The quiz pipeline's annotations (parser sentences, entities) cover
+        # what flashcards need, so one parse serves both
+        name = "quiz_generator" if "quiz" in requested else "flashcard_generator"
+        generator = await registry.aget(name)
+        with stage("spacy_parse"):
+            return await worker_pool.submit(analysis_cache.get_doc, generator.nlp, request.text)
+
+    parsed = asyncio.ensure_future(parse()) if requested & {"quiz", "flashcards"} else None
+
+    async def make_summary():
+        engine = await choose_engine(document, request.mode)
+        result = await summarize_document(document, request.length, request.mode, engine)
+        return build_summary_response(document, result, (await asyncio.shield(keywords))[:SUMMARY_KEYWORDS])
+
+    async def make_quiz():
+        if len(request.text.strip()) < 100:
+            raise ValueError("Text too short for quiz generation")
+        quiz_generator = await registry.aget("quiz_generator")
+        doc = await asyncio.shield(parsed)
+        quiz_data = await worker_pool.submit(
+            quiz_generator.generate_quiz_from_doc, doc, request.num_questions, request.question_types
+        )
+        return QuizGenerateResponse(**quiz_data)
+
+    async def make_flashcards():
+        flashcard_generator = await registry.aget("flashcard_generator")
+        doc = await asyncio.shield(parsed)
+        cards = await worker_pool.submit(
+            flashcard_generator.generate_flashcards_from_doc, doc, request.count, request.seed
+        )
+        return FlashcardGenerateResponse(title="Study Flashcards", cards=cards)
+
+    async def top_keywords():
+        return (await asyncio.shield(keywords))[:request.num_keywords]
+
+    makers = {"summary": make_summary, "quiz": make_quiz, "flashcards": make_flashcards, "keywords": top_keywords}
+    for name in ARTIFACTS:
+        if name in requested:
+            tasks[name] = asyncio.ensure_future(makers[name]())
+    # Keep the shared tasks in the set that gets cancelled when the request ends
+    tasks["_keywords"] = keywords
+    if parsed is not None:
+        tasks["_parse"] = parsed
+    return tasks
+
+def _error_detail(e: Exception) -> str:
+    return getattr(e, "detail", None) or str(e)
+
+async def _settle(name: str, task: asyncio.Future):
+    """(name, result, error) of an artifact task; cancellation of the request still propagates"""
+    try:
+        return name, await task, None
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        return name, None, e
+
+def _cancel(tasks: Dict[str, asyncio.Future]):
+    for task in tasks.values():
+        task.cancel()
+        # Shared tasks may have failed with nobody left to await them
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+@router.post("/analyze")
+async def analyze(request: AnalyzeRequest):
+    """
+    Summary, quiz, flashcards and keywords for one text in a single call.
+    Each artifact that fails is reported in errors without failing the rest.
+    With stream=true the response is NDJSON: one {"type": <artifact>,
+    "result": ...} or {"type": "error", "artifact": ..., "detail": ...} event
+    per artifact as it completes, then {"type": "done"}.
+    """
+    try:
+        _validate(request)
+        if request.stream:
+            return await _stream(request)
+
+        async with worker_pool.admit("analyze"):
+            tasks = _start_artifacts(request)
+            try:
+                settled = await asyncio.gather(*(_settle(name, tasks[name]) for name in request.artifacts))
+            finally:
+                _cancel(tasks)
+
+        response = AnalyzeResponse()
+        for name, result, error in settled:
+            if error is not None:
+                response.errors[name] = _error_detail(error)
+            else:
+                setattr(response, name, result)
+        return response
+    except (HTTPException, ServiceOverloaded, ModelUnavailable, RequestCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream(request: AnalyzeRequest) -> StreamingResponse:
+    # Admit before the response starts so an overloaded service still answers 429
+    admission = worker_pool.admit("analyze")
+    await admission.__aenter__()
+
+    async def events():
+        # Started only once the body is being sent, so a client that goes
+        # away before that leaves no work running
+        tasks = _start_artifacts(request)
+        try:
+            for settled in asyncio.as_completed([_settle(name, tasks[name]) for name in request.artifacts]):
+                name, result, error = await settled
+                if error is not None:
+                    yield json.dumps({"type": "error", "artifact": name, "detail": _error_detail(error)}) + "\n"
+                else:
+                    payload = result if isinstance(result, list) else result.model_dump()
+                    yield json.dumps({"type": name, "result": payload}) + "\n"
+            yield json.dumps({"type": "done"}) + "\n"
+        finally:
+            _cancel(tasks)
+
+    # The response releases the admission, even if the body never starts
+    return AdmittedStreamingResponse(admission, events(), media_type="application/x-ndjson")
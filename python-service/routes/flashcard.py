@@ -1,14 +1,23 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from config import settings
 from services.flashcard_generator import FlashcardGenerator
+from services.executor import worker_pool, ServiceOverloaded
+from services.model_registry import registry, ModelUnavailable
+from services.request_context import RequestCancelled
 
 router = APIRouter()
-flashcard_generator = FlashcardGenerator()
+registry.register("flashcard_generator", FlashcardGenerator)
 
 class FlashcardGenerateRequest(BaseModel):
     text: str
     count: int = 10
+    # "standard", "incremental" (reuse per-paragraph parses of edited re-uploads)
+    # or "streaming" (bounded memory, stops once enough good cards are found)
+    mode: str = "standard"
+    # Makes the selection of cards repeatable
+    seed: Optional[int] = None
 
 class Card(BaseModel):
     front: str
@@ -24,11 +33,74 @@ async def generate_flashcards(request: FlashcardGenerateRequest):
         if not request.text or len(request.text.strip()) < 50:
             raise HTTPException(status_code=400, detail="Text too short for flashcard generation")
         
-        flashcards_data = flashcard_generator.generate_flashcards(
-            text=request.text,
-            count=request.count
+        flashcard_generator = await registry.aget("flashcard_generator")
+        if request.mode == "streaming":
+            cards = await worker_pool.run(
+                "flashcards",
+                flashcard_generator.generate_flashcards_streaming,
+                text=request.text,
+                num_cards=request.count,
+                seed=request.seed
+            )
+        else:
+            cards = await worker_pool.run(
+                "flashcards",
+                flashcard_generator.generate_flashcards,
+                text=request.text,
+                num_cards=request.count,
+                incremental=request.mode == "incremental",
+                seed=request.seed
+            )
+        
+        return FlashcardGenerateResponse(title="Study Flashcards", cards=cards)
+    except (HTTPException, ServiceOverloaded, ModelUnavailable, RequestCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class FlashcardBatchRequest(BaseModel):
+    texts: List[str]
+    count: int = 10
+
+class FlashcardBatchItem(BaseModel):
+    index: int
+    result: Optional[FlashcardGenerateResponse] = None
+    error: Optional[str] = None
+
+class FlashcardBatchResponse(BaseModel):
+    results: List[FlashcardBatchItem]
+
+@router.post("/flashcards/generate/batch", response_model=FlashcardBatchResponse)
+async def generate_flashcards_batch(request: FlashcardBatchRequest):
+    """Generate flashcards per document with one batched spaCy pass; failures are reported per document"""
+    try:
+        if len(request.texts) > settings.BATCH_MAX_DOCUMENTS:
+            raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_DOCUMENTS} documents per batch")
+        
+        results = [FlashcardBatchItem(index=i) for i in range(len(request.texts))]
+        valid = []
+        for i, text in enumerate(request.texts):
+            if not text or len(text.strip()) < 50:
+                results[i].error = "Text too short for flashcard generation"
+            else:
+                valid.append(i)
+        
+        flashcard_generator = await registry.aget("flashcard_generator")
+        decks = await worker_pool.run(
+            "flashcards",
+            flashcard_generator.generate_flashcards_batch,
+            [request.texts[i] for i in valid],
+            num_cards=request.count
         )
         
-        return FlashcardGenerateResponse(**flashcards_data)
+        for i, cards in zip(valid, decks):
+            if isinstance(cards, Exception):
+                results[i].error = str(cards)
+            else:
+                results[i].result = FlashcardGenerateResponse(title="Study Flashcards", cards=cards)
+        
+        return FlashcardBatchResponse(results=results)
+    except (HTTPException, ServiceOverloaded, ModelUnavailable, RequestCancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,16 +1,22 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
+from config import settings
 from services.quiz_generator import QuizGenerator
+from services.executor import worker_pool, ServiceOverloaded
+from services.model_registry import registry, ModelUnavailable
+from services.request_context import RequestCancelled
 
 router = APIRouter()
-quiz_generator = QuizGenerator()
+registry.register("quiz_generator", QuizGenerator)
 
 class QuizGenerateRequest(BaseModel):
     text: str
     num_questions: int = 10
     difficulty: str = "medium"
     question_types: List[str] = ["multiple_choice", "true_false"]
+    # "standard" or "incremental" (reuse per-paragraph parses of edited re-uploads)
+    mode: str = "standard"
 
 class Question(BaseModel):
     question: str
@@ -31,13 +37,70 @@ async def generate_quiz(request: QuizGenerateRequest):
         if not request.text or len(request.text.strip()) < 100:
             raise HTTPException(status_code=400, detail="Text too short for quiz generation")
         
-        quiz_data = quiz_generator.generate_quiz(
+        quiz_generator = await registry.aget("quiz_generator")
+        quiz_data = await worker_pool.run(
+            "quiz",
+            quiz_generator.generate_quiz,
             text=request.text,
             num_questions=request.num_questions,
             difficulty=request.difficulty,
-            question_types=request.question_types
+            question_types=request.question_types,
+            incremental=request.mode == "incremental"
         )
         
         return QuizGenerateResponse(**quiz_data)
+    except (HTTPException, ServiceOverloaded, ModelUnavailable, RequestCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class QuizBatchRequest(BaseModel):
+    texts: List[str]
+    num_questions: int = 10
+    difficulty: str = "medium"
+    question_types: List[str] = ["multiple_choice", "true_false"]
+
+class QuizBatchItem(BaseModel):
+    index: int
+    result: Optional[QuizGenerateResponse] = None
+    error: Optional[str] = None
+
+class QuizBatchResponse(BaseModel):
+    results: List[QuizBatchItem]
+
+@router.post("/quiz/generate/batch", response_model=QuizBatchResponse)
+async def generate_quizzes(request: QuizBatchRequest):
+    """Generate a quiz per document with one batched spaCy pass; failures are reported per document"""
+    try:
+        if len(request.texts) > settings.BATCH_MAX_DOCUMENTS:
+            raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_DOCUMENTS} documents per batch")
+        
+        results = [QuizBatchItem(index=i) for i in range(len(request.texts))]
+        valid = []
+        for i, text in enumerate(request.texts):
+            if not text or len(text.strip()) < 100:
+                results[i].error = "Text too short for quiz generation"
+            else:
+                valid.append(i)
+        
+        quiz_generator = await registry.aget("quiz_generator")
+        quizzes = await worker_pool.run(
+            "quiz",
+            quiz_generator.generate_quizzes,
+            [request.texts[i] for i in valid],
+            num_questions=request.num_questions,
+            difficulty=request.difficulty,
+            question_types=request.question_types
+        )
+        
+        for i, quiz_data in zip(valid, quizzes):
+            if isinstance(quiz_data, Exception):
+                results[i].error = str(quiz_data)
+            else:
+                results[i].result = QuizGenerateResponse(**quiz_data)
+        
+        return QuizBatchResponse(results=results)
+    except (HTTPException, ServiceOverloaded, ModelUnavailable, RequestCancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
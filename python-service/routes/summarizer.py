@@ -1,20 +1,125 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import json
+from config import settings
 from services.text_summarizer import TextSummarizer
+from services.executor import worker_pool, ServiceOverloaded
+from services.extractive_summarizer import extractive_summarizer
+from services.ingest import DocumentError, document_kind, iter_document_text, read_upload_form
+from services.keyword_engine import keyword_engine
+from services.metrics import stage
+from services.model_registry import registry, ModelUnavailable
+from services.request_context import RequestCancelled, current_request
+from services.streaming import AdmittedStreamingResponse
+from utils.document import Document, word_count
 
 router = APIRouter()
-summarizer = TextSummarizer()
+registry.register("summarizer", TextSummarizer)
 
 class SummarizeRequest(BaseModel):
     text: str
     length: str = "medium"
+    # "standard", "hierarchical" (map-reduce for book-length inputs),
+    # "incremental" (reuse per-chunk summaries of edited re-uploads),
+    # "extractive" (TextRank, no model) or "auto" (extractive for short
+    # inputs or when BART is backed up, standard otherwise)
+    mode: str = "standard"
+
+class SummaryLevel(BaseModel):
+    level: int
+    calls: int
+    seconds: float
 
 class SummarizeResponse(BaseModel):
     summary: str
     keywords: List[str]
     original_length: int
     summary_length: int
+    chunk_count: Optional[int] = None
+    token_fill_ratio: Optional[float] = None
+    depth: Optional[int] = None
+    levels: Optional[List[SummaryLevel]] = None
+    reused_chunks: Optional[int] = None
+    cached: bool = False
+    # "abstractive" (BART) or "extractive"
+    engine: str = "abstractive"
+
+class SummarizeBatchRequest(BaseModel):
+    texts: List[str]
+    length: str = "medium"
+    mode: str = "standard"
+
+class SummarizeBatchItem(BaseModel):
+    index: int
+    result: Optional[SummarizeResponse] = None
+    error: Optional[str] = None
+
+class SummarizeBatchResponse(BaseModel):
+    results: List[SummarizeBatchItem]
+
+def build_summary_response(document: Document, result: dict, keywords: List[str]) -> SummarizeResponse:
+    summary = result["summary"]
+    return SummarizeResponse(
+        summary=summary,
+        keywords=keywords,
+        original_length=document.word_count,
+        summary_length=word_count(summary),
+        chunk_count=result.get("chunk_count"),
+        token_fill_ratio=result.get("token_fill_ratio"),
+        depth=result.get("depth"),
+        levels=result.get("levels"),
+        reused_chunks=result.get("reused_chunks"),
+        cached=result["cached"],
+        engine=result["engine"]
+    )
+
+async def choose_engine(document: Document, mode: str) -> str:
+    """
+    "extractive" or "abstractive" for a request. mode="auto" skips BART when
+    it adds little (short inputs) or when it would be slow to answer: the
+    model is still loading or failed to load, its queue is full, or the
+    estimated wait exceeds SUMMARY_AUTO_MAX_WAIT_S or the request's deadline.
+    """
+    if mode == "extractive":
+        return "extractive"
+    if mode != "auto":
+        return "abstractive"
+    # The word count comes from normalizing the text, two regex passes over
+    # the whole input; run them off the event loop (Document keeps the result)
+    await asyncio.to_thread(lambda: document.text)
+    if document.word_count < settings.SUMMARY_AUTO_EXTRACTIVE_WORDS:
+        return "extractive"
+    state = registry.state("summarizer")
+    if state in ("loading", "failed"):
+        return "extractive"
+    if worker_pool.pending("summarize") >= worker_pool.queue_limits.get("summarize", worker_pool.default_queue_limit):
+        return "extractive"
+    if state == "ready":
+        max_wait = settings.SUMMARY_AUTO_MAX_WAIT_S
+        request = current_request()
+        if request is not None and request.deadline is not None:
+            max_wait = min(max_wait, request.remaining())
+        if registry.get("summarizer").batcher.estimated_wait() > max_wait:
+            return "extractive"
+    return "abstractive"
+
+def _abstractive_mode(mode: str) -> str:
+    return "standard" if mode == "auto" else mode
+
+async def summarize_document(document: Document, length: str, mode: str, engine: str) -> dict:
+    """
+    Summary of a document with the engine choose_engine picked, for a request
+    already admitted to the worker pool. Model calls go through the
+    summarizer's batcher; the remaining CPU-bound work runs on the pool.
+    """
+    if engine == "extractive":
+        result = await worker_pool.submit(extractive_summarizer.summarize, document, length)
+        return {**result, "engine": "extractive", "cached": False}
+    summarizer = await registry.aget("summarizer")
+    result = await summarizer.summarize_cached(document, length, _abstractive_mode(mode))
+    return {**result, "engine": "abstractive"}
 
 @router.post("/summarize", response_model=SummarizeResponse)
 async def generate_summary(request: SummarizeRequest):
@@ -22,14 +127,183 @@ async def generate_summary(request: SummarizeRequest):
         if not request.text or len(request.text.strip()) < 50:
             raise HTTPException(status_code=400, detail="Text too short for summarization")
         
-        summary = summarizer.summarize(request.text, request.length)
-        keywords = summarizer.extract_keywords(request.text)
+        # Normalized once here and shared by the cache key, chunking and the response
+        document = Document(request.text)
+        engine = await choose_engine(document, request.mode)
+        async with worker_pool.admit("summarize_extractive" if engine == "extractive" else "summarize"):
+            result = await summarize_document(document, request.length, request.mode, engine)
+            with stage("keywords"):
+                keywords = await worker_pool.submit(keyword_engine.extract, request.text, 5)
+        
+        return build_summary_response(document, result, keywords)
+    except (HTTPException, ServiceOverloaded, ModelUnavailable, RequestCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/summarize/batch", response_model=SummarizeBatchResponse)
+async def generate_summaries(request: SummarizeBatchRequest):
+    """Summarize many documents in one call; failures are reported per document"""
+    try:
+        if len(request.texts) > settings.BATCH_MAX_DOCUMENTS:
+            raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_DOCUMENTS} documents per batch")
+        
+        documents = [Document(text) for text in request.texts]
+        results = [SummarizeBatchItem(index=i) for i in range(len(request.texts))]
+        valid = []
+        for i, text in enumerate(request.texts):
+            if not text or len(text.strip()) < 50:
+                results[i].error = "Text too short for summarization"
+            else:
+                valid.append(i)
+        
+        def extract_all_keywords():
+            try:
+                with stage("keywords"):
+                    found = keyword_engine.extract_batch([request.texts[i] for i in valid])
+            except Exception:
+                found = [[] for _ in valid]
+            return dict(zip(valid, found))
+        
+        engines = {i: await choose_engine(documents[i], request.mode) for i in valid}
+        abstractive = [i for i in valid if engines[i] == "abstractive"]
+        extractive = [i for i in valid if engines[i] == "extractive"]
+        
+        def extract_all():
+            summaries = []
+            for i in extractive:
+                try:
+                    summaries.append({**extractive_summarizer.summarize(documents[i], request.length),
+                                      "engine": "extractive", "cached": False})
+                except Exception as e:
+                    summaries.append(e)
+            return summaries
+        
+        summarizer = await registry.aget("summarizer") if abstractive else None
+        summaries = {}
+        async with worker_pool.admit("summarize"):
+            if extractive:
+                summaries.update(zip(extractive, await worker_pool.submit(extract_all)))
+            if abstractive:
+                found = await summarizer.summarize_many(
+                    [documents[i] for i in abstractive], request.length, _abstractive_mode(request.mode)
+                )
+                summaries.update(
+                    (i, result if isinstance(result, Exception) else {**result, "engine": "abstractive"})
+                    for i, result in zip(abstractive, found)
+                )
+            keywords = await worker_pool.submit(extract_all_keywords)
+        
+        for i in valid:
+            result = summaries[i]
+            if isinstance(result, Exception):
+                results[i].error = str(result)
+            else:
+                results[i].result = build_summary_response(documents[i], result, keywords[i])
+        
+        return SummarizeBatchResponse(results=results)
+    except (HTTPException, ServiceOverloaded, ModelUnavailable, RequestCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# The form is parsed by the route itself (see read_upload_form), so describe it here
+UPLOAD_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "file": {"type": "string", "format": "binary"},
+                "length": {"type": "string", "default": "medium"},
+            },
+        }}},
+    }
+}
+
+@router.post("/summarize/upload", response_model=SummarizeResponse, openapi_extra=UPLOAD_FORM_SCHEMA)
+async def summarize_upload(request: Request):
+    """
+    Summarize an uploaded PDF or text file. The file is read page by page (or
+    block by block), normalized and chunked as it is read, and chunks go
+    straight to the model, so memory does not grow with the file size.
+    Uploads over UPLOAD_MAX_MB are refused while they are being received.
+    """
+    form = None
+    try:
+        form = await read_upload_form(request, settings.UPLOAD_MAX_MB * 1024 * 1024)
+        file = form.get("file")
+        if file is None or isinstance(file, str):
+            raise HTTPException(status_code=422, detail="A file is required")
+        length = form.get("length") or "medium"
+        kind = document_kind(file.filename, file.content_type)
+        
+        summarizer = await registry.aget("summarizer")
+        keywords = keyword_engine.accumulator()
+        async with worker_pool.admit("summarize"):
+            result = await summarizer.summarize_pieces(
+                iter_document_text(file.file, kind), length, on_chunk=keywords.add
+            )
+            if not result["summary"]:
+                raise HTTPException(status_code=400, detail="No text found in the uploaded file")
+            with stage("keywords"):
+                top_keywords = await worker_pool.submit(keywords.top)
         
         return SummarizeResponse(
-            summary=summary,
-            keywords=keywords,
-            original_length=len(request.text.split()),
-            summary_length=len(summary.split())
+            summary=result["summary"],
+            keywords=top_keywords,
+            original_length=result["original_length"],
+            summary_length=word_count(result["summary"]),
+            chunk_count=result["chunk_count"],
+            token_fill_ratio=result["token_fill_ratio"],
+            depth=result["depth"],
+            levels=result["levels"]
         )
+    except DocumentError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except (HTTPException, ServiceOverloaded, ModelUnavailable, RequestCancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if form is not None:
+            await form.close()
+
+@router.post("/summarize/stream")
+async def stream_summary(request: SummarizeRequest):
+    """
+    Stream the summary as NDJSON: one {"type": "chunk"} event per chunk summary
+    as it completes, then a final {"type": "summary"} event with the combined
+    summary and keywords.
+    """
+    if not request.text or len(request.text.strip()) < 50:
+        raise HTTPException(status_code=400, detail="Text too short for summarization")
+    
+    summarizer = await registry.aget("summarizer")
+    document = Document(request.text)
+    
+    # Admit before the response starts so an overloaded service still answers 429
+    admission = worker_pool.admit("summarize")
+    await admission.__aenter__()
+    
+    async def events():
+        keywords_task = asyncio.ensure_future(
+            worker_pool.submit(summarizer.extract_keywords, request.text)
+        )
+        try:
+            async for event in summarizer.summarize_stream(document, request.length):
+                if event["type"] == "summary":
+                    event["keywords"] = await keywords_task
+                    event["original_length"] = document.word_count
+                    event["summary_length"] = word_count(event["summary"])
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        finally:
+            keywords_task.cancel()
+            # It may have failed (e.g. cancelled request) with nobody awaiting it
+            keywords_task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    
+    # The response releases the admission, even if the body never starts
+    return AdmittedStreamingResponse(admission, events(), media_type="application/x-ndjson")
@@ -0,0 +1,160 @@
+"""
+Production launcher: load the models once, then fork worker processes that
+share them.
+
+The parent process imports the app and loads every registered model, then
+forks SERVER_WORKERS children that each run uvicorn on the same listening
+socket. Model weights (torch tensors, spaCy arrays) are read-only after
+loading, so the children share those memory pages copy-on-write instead of
+each loading their own copy.
+
+Each worker limits torch to its share of the CPU cores and turns off
+tokenizer parallelism, so N workers do not run N full-size thread pools
+on the same cores. The parent restarts workers that crash and forwards
+SIGTERM / SIGINT to them for a graceful shutdown.
+
+The keyword IDF table and the distractor index are per process. Only the
+first worker saves them to MODEL_CACHE_DIR; the others update their own
+copy in memory, which is lost when they exit. (With every worker saving to
+the same file, the last save would drop the others' updates.) The result
+cache is shared through its SQLite file.
+
+Throughput against the worker count has not been measured on a multi-core
+machine yet (see benchmarks/bench_workers.py), so SERVER_WORKERS defaults
+to 1.
+
+Run from the python-service directory:
+    python serve.py --workers 4
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+from config import settings
+
+
+def threads_per_worker(workers: int) -> int:
+    if settings.SERVER_THREADS_PER_WORKER > 0:
+        return settings.SERVER_THREADS_PER_WORKER
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, threads: int, log_level: str, slot: int):
+    """Body of a forked worker: per-process setup, then uvicorn on the shared socket"""
+    import torch
+    import uvicorn
+    from app import app
+    from services.distractor_index import distractor_index
+    from services.keyword_engine import keyword_engine
+    from services.result_cache import summary_cache
+
+    # Own process group, so a Ctrl-C in the terminal reaches only the parent,
+    # which then stops the workers once each
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    if summary_cache is not None:
+        summary_cache.reopen()
+    for state in (keyword_engine, distractor_index):
+        if slot == 0:
+            # A restarted first worker picks up what its predecessor saved
+            state.reload()
+        else:
+            state.stop_saving()
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def spawn(sock: socket.socket, threads: int, log_level: str, slot: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock, threads, log_level, slot)
+        except BaseException as e:
+            print(f"Worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    threads = threads_per_worker(workers)
+    # Read by OpenMP / MKL / tokenizers when they first start their thread
+    # pools, which happens in the workers, after the fork
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    start = time.perf_counter()
+    from services.model_registry import registry
+    import app  # noqa: F401  registers the model loaders of every route
+    registry.load_all()
+    print(f"Loaded models in {time.perf_counter() - start:.1f}s, starting {workers} workers "
+          f"with {threads} thread(s) each")
+    # A collection in a worker writes to the header of every object it
+    # scans, copying pages that could stay shared; freeze() moves everything
+    # loaded so far out of the collector's reach
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    # pid -> worker slot; a restarted worker takes over its predecessor's slot
+    children = {spawn(sock, threads, args.log_level, slot): slot for slot in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if not stopping and slot is not None:
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            # Avoid a tight restart loop if workers die right away
+            time.sleep(1)
+            children[spawn(sock, threads, args.log_level, slot)] = slot
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
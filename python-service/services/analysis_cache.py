@@ -0,0 +1,271 @@
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from spacy.tokens import Doc, DocBin
+
+from config import settings
+from services.paragraphs import split_paragraphs
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different copies of an upload share one cache entry"""
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text.strip()
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache of parsed spaCy documents.
+
+    Entries are keyed by a hash of the normalized text plus the pipeline
+    identity and stored as serialized DocBin bytes, so a document parsed for
+    a quiz can be reused by the flashcard generator (and vice versa).
+    The in-memory tier is an LRU bounded by total serialized size; the
+    optional disk tier lives under MODEL_CACHE_DIR and survives restarts.
+    """
+    def __init__(self, max_bytes: int = None, disk_dir: Optional[str] = None,
+                 max_disk_entries: int = None):
+        if max_bytes is None:
+            max_bytes = settings.ANALYSIS_CACHE_MAX_MB * 1024 * 1024
+        if max_disk_entries is None:
+            max_disk_entries = settings.ANALYSIS_CACHE_DISK_MAX_ENTRIES
+
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def pipeline_id(nlp) -> str:
+        """Identify a pipeline by model name, version and active components"""
+        meta = nlp.meta
+        return f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}:{','.join(nlp.pipe_names)}"
+
+    def key(self, text: str, nlp) -> str:
+        return self._key(text, self.pipeline_id(nlp))
+
+    def _key(self, text: str, pipeline_id: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(pipeline_id.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_doc(self, nlp, text: str) -> Doc:
+        """
+        Return the parsed Doc for text, running the pipeline only on a cache miss.
+        A pipeline may list other pipeline ids (reusable_pipeline_ids) whose Docs
+        carry every annotation it needs; those entries are served as hits too.
+        """
+        text = normalize_text(text)
+        key = self.key(text, nlp)
+
+        data = self._lookup(nlp, text, key)
+        if data is not None:
+            return next(DocBin().from_bytes(data).get_docs(nlp.vocab))
+
+        with self._lock:
+            self.misses += 1
+
+        doc = nlp(text)
+        self._store(key, doc)
+        return doc
+
+    def get_docs(self, nlp, texts: List[str], batch_size: int = None, n_process: int = None,
+                 return_exceptions: bool = False) -> List[Doc]:
+        """
+        Batch version of get_doc: cache hits are deserialized and all misses
+        are parsed together with nlp.pipe. With return_exceptions, a document
+        that fails to parse gets its exception in its slot instead of failing
+        the whole batch.
+        """
+        if batch_size is None:
+            batch_size = settings.SPACY_BATCH_SIZE
+        if n_process is None:
+            n_process = settings.SPACY_N_PROCESS
+
+        texts = [normalize_text(text) for text in texts]
+        keys = [self.key(text, nlp) for text in texts]
+        docs: List[Optional[Doc]] = [None] * len(texts)
+        missing = []
+        for i, (text, key) in enumerate(zip(texts, keys)):
+            data = self._lookup(nlp, text, key)
+            if data is not None:
+                docs[i] = next(DocBin().from_bytes(data).get_docs(nlp.vocab))
+            else:
+                missing.append(i)
+
+        with self._lock:
+            self.misses += len(missing)
+
+        try:
+            parsed = list(nlp.pipe((texts[i] for i in missing), batch_size=batch_size, n_process=n_process))
+        except Exception:
+            if not return_exceptions:
+                raise
+            # Fall back to one document at a time to isolate the failing ones
+            parsed = []
+            for i in missing:
+                try:
+                    parsed.append(nlp(texts[i]))
+                except Exception as e:
+                    parsed.append(e)
+
+        for i, doc in zip(missing, parsed):
+            if not isinstance(doc, Exception):
+                self._store(keys[i], doc)
+            docs[i] = doc
+        return docs
+
+    def get_paragraph_doc(self, nlp, text: str) -> Doc:
+        """
+        Parse text one paragraph at a time and merge the paragraph Docs. After
+        an edit only the changed paragraphs miss the cache and are parsed again.
+        """
+        # The merged Doc needs every paragraph anyway
+        paragraphs = list(split_paragraphs(normalize_text(text)))
+        if len(paragraphs) <= 1:
+            return self.get_doc(nlp, text)
+        docs = self.get_docs(nlp, paragraphs)
+        return Doc.from_docs(docs, attrs=getattr(nlp, "doc_attrs", None))
+
+    def _lookup(self, nlp, text: str, key: str) -> Optional[bytes]:
+        """Serialized Doc for text from memory or disk, trying reusable pipelines' entries too"""
+        alternates = [self._key(text, pid) for pid in getattr(nlp, "reusable_pipeline_ids", ())]
+
+        data = None
+        for candidate in [key] + alternates:
+            data = self._get_memory(candidate)
+            if data is not None:
+                break
+        if data is None:
+            for candidate in [key] + alternates:
+                data = self._get_disk(candidate)
+                if data is not None:
+                    with self._lock:
+                        self.disk_hits += 1
+                    self._put_memory(candidate, data)
+                    break
+        return data
+
+    def _store(self, key: str, doc: Doc):
+        doc_bin = DocBin()
+        doc_bin.add(doc)
+        data = doc_bin.to_bytes()
+        self._put_memory(key, data)
+        self._put_disk(key, data)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.spacy")
+
+    def _get_disk(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _put_disk(self, key: str, data: bytes):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            should_prune = self._disk_writes % 100 == 0
+        if should_prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop the least recently written files once the disk tier is over its limit"""
+        try:
+            names = [name for name in os.listdir(self.disk_dir) if name.endswith(".spacy")]
+        except OSError:
+            return
+        if len(names) <= self.max_disk_entries:
+            return
+
+        files = []
+        for name in names:
+            path = os.path.join(self.disk_dir, name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        files.sort()
+        for _, path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+analysis_cache = AnalysisCache(
+    disk_dir=os.path.join(settings.MODEL_CACHE_DIR, "analysis") if settings.ANALYSIS_CACHE_DISK else None
+)
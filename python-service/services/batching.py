@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import time
+from typing import Any, Callable, Hashable, List, Optional
+
+from services.request_context import priority
+
+
+class MicroBatcher:
+    """
+    Collects work items submitted by concurrent callers into batches.
+
+    A batch is closed once it holds max_batch_size items or max_wait_ms has
+    passed since its first item arrived. Items are grouped by a hashable key
+    (for example generation parameters), each group is handed to
+    process_batch in a worker thread, and every caller gets back its own
+    result. Batches run one at a time, so items keep accumulating while the
+    model is busy and the next batch is fuller. Queued items are taken in
+    order of their request's priority, so the chunks of a short document
+    are not stuck behind those of a book submitted just before it.
+    """
+    def __init__(self, process_batch: Callable[[List[Any], Hashable], List[Any]],
+                 max_batch_size: int = 8, max_wait_ms: float = 20, executor=None):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.executor = executor
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+
+        self.batches = 0
+        self.items = 0
+        self._busy = False
+        # Exponentially weighted average duration of one process_batch call
+        self._batch_seconds: Optional[float] = None
+
+    async def submit(self, item: Any, group: Hashable = None) -> Any:
+        """Queue one item and wait for its result"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((priority(), next(self._sequence), item, group, future))
+        return await future
+
+    async def submit_many(self, items: List[Any], group: Hashable = None) -> List[Any]:
+        return await asyncio.gather(*(self.submit(item, group) for item in items))
+
+    def estimated_wait(self) -> float:
+        """Rough time a newly submitted item would wait before its batch starts"""
+        if self._batch_seconds is None:
+            return 0.0
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return (queued // self.max_batch_size + (1 if self._busy else 0)) * self._batch_seconds
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "estimated_wait_s": round(self.estimated_wait(), 3),
+        }
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _record_duration(self, seconds: float):
+        previous = self._batch_seconds
+        self._batch_seconds = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+
+            groups = {}
+            for _, _, item, group, future in batch:
+                # Callers that gave up (e.g. client disconnected) are skipped
+                if not future.done():
+                    groups.setdefault(group, []).append((item, future))
+
+            for group, entries in groups.items():
+                items = [item for item, _ in entries]
+                self._busy = True
+                start = time.monotonic()
+                try:
+                    results = await self._loop.run_in_executor(self.executor, self.process_batch, items, group)
+                except Exception as e:
+                    for _, future in entries:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                finally:
+                    self._busy = False
+                    self._record_duration(time.monotonic() - start)
+
+                self.batches += 1
+                self.items += len(items)
+                for (_, future), result in zip(entries, results):
+                    if not future.done():
+                        future.set_result(result)
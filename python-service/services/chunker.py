@@ -0,0 +1,174 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import settings
+from services.paragraphs import is_anchor
+from utils.document import SENTENCE_PATTERN
+
+
+class SentenceChunker:
+    """
+    Packs whole sentences into chunks that fit the summarization model's
+    token window.
+
+    The text is tokenized once with the fast tokenizer's offset mapping, so
+    per-sentence token counts are two binary searches rather than a separate
+    tokenizer call per sentence. Sentences longer than the budget are split
+    at token boundaries. Optionally the last few sentences of a chunk are
+    repeated at the start of the next one for context.
+    """
+    def __init__(self, tokenizer, max_tokens: int = None, overlap_sentences: int = None):
+        self.tokenizer = tokenizer
+        if max_tokens is None:
+            max_tokens = settings.SUMMARY_CHUNK_TOKENS
+        if overlap_sentences is None:
+            overlap_sentences = settings.SUMMARY_CHUNK_OVERLAP_SENTENCES
+        model_max = getattr(tokenizer, "model_max_length", max_tokens) or max_tokens
+        # Leave room for the <s> and </s> tokens the pipeline adds around each chunk
+        self.budget = max(1, min(max_tokens, model_max) - tokenizer.num_special_tokens_to_add())
+        self.overlap_sentences = max(0, overlap_sentences)
+
+    def chunk_spans(self, text: str, sentences: Optional[Iterable[Tuple[int, int]]] = None) -> List[Tuple[int, int, int]]:
+        """
+        Return (start, end, token_count) for each chunk of text. sentences,
+        if given, are precomputed (start, end) sentence offsets into text.
+        """
+        if not text:
+            return []
+
+        encoding = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )
+        # Flat arrays rather than lists of int objects: a few bytes per token
+        token_starts = array("q", (start for start, _ in encoding["offset_mapping"]))
+        token_ends = array("q", (end for _, end in encoding["offset_mapping"]))
+
+        if sentences is None:
+            sentences = (match.span() for match in SENTENCE_PATTERN.finditer(text))
+
+        units = []
+        for start, end in sentences:
+            first = bisect_left(token_starts, start)
+            last = bisect_left(token_starts, end)
+            units.extend(self._split_long_sentence(start, end, first, last, token_starts, token_ends))
+
+        chunks = []
+        current = []
+        current_tokens = 0
+        for unit in units:
+            unit_tokens = unit[2]
+            if current and current_tokens + unit_tokens > self.budget:
+                chunks.append((current[0][0], current[-1][1], current_tokens))
+                current = self._overlap(current, unit_tokens)
+                current_tokens = sum(u[2] for u in current)
+            current.append(unit)
+            current_tokens += unit_tokens
+
+        if current:
+            chunks.append((current[0][0], current[-1][1], current_tokens))
+        return chunks
+
+    def chunk(self, text: str) -> Tuple[List[str], Dict]:
+        """Split text into chunk strings and report how well they fill the token budget"""
+        spans = self.chunk_spans(text)
+        return [text[start:end] for start, end, _ in spans], self.stats(spans)
+
+    def chunk_stream(self, pieces: Iterable[str]) -> Iterator[Tuple[str, int]]:
+        """
+        Chunk text that arrives in pieces, yielding (chunk, token_count) as soon
+        as a chunk is complete. Only the unfinished last chunk is carried over to
+        the next piece, so memory stays at a few token windows for any length.
+        """
+        # Roughly four token windows of text before it is worth tokenizing
+        flush_chars = self.budget * 16
+        buffer = ""
+        for piece in pieces:
+            buffer += piece
+            if len(buffer) < flush_chars:
+                continue
+            spans = self.chunk_spans(buffer)
+            if len(spans) < 2:
+                continue
+            for start, end, count in spans[:-1]:
+                yield buffer[start:end], count
+            buffer = buffer[spans[-1][0]:]
+
+        for start, end, count in self.chunk_spans(buffer):
+            yield buffer[start:end], count
+
+    def chunk_paragraphs(self, paragraphs: List[str]) -> Tuple[List[str], Dict]:
+        """
+        Pack whole paragraphs into chunks with content-defined boundaries.
+        A chunk closes when the next paragraph would overflow the budget, or
+        after an anchor paragraph once it is at least half full. Boundaries
+        therefore depend on nearby content, so after an edit only the chunks
+        around it change and the others keep their exact text (and their
+        cached summaries).
+        """
+        if not paragraphs:
+            return [], self.stats_for_counts([])
+
+        counts = [len(ids) for ids in self.tokenizer(
+            paragraphs, add_special_tokens=False, verbose=False
+        )["input_ids"]]
+
+        chunks = []
+        token_counts = []
+        current = []
+        current_tokens = 0
+
+        def close():
+            nonlocal current, current_tokens
+            if current:
+                chunks.append(" ".join(current))
+                token_counts.append(current_tokens)
+            current, current_tokens = [], 0
+
+        for paragraph, count in zip(paragraphs, counts):
+            if count > self.budget:
+                # Too long for one chunk: split it at sentences on its own
+                close()
+                for start, end, span_tokens in self.chunk_spans(paragraph):
+                    chunks.append(paragraph[start:end])
+                    token_counts.append(span_tokens)
+                continue
+            if current and current_tokens + count > self.budget:
+                close()
+            current.append(paragraph)
+            current_tokens += count
+            if current_tokens >= self.budget // 2 and is_anchor(paragraph):
+                close()
+        close()
+        return chunks, self.stats_for_counts(token_counts)
+
+    def stats(self, spans: List[Tuple[int, int, int]]) -> Dict:
+        return self.stats_for_counts([count for _, _, count in spans])
+
+    def stats_for_counts(self, token_counts: List[int]) -> Dict:
+        tokens = sum(token_counts)
+        return {
+            "chunk_count": len(token_counts),
+            "tokens": tokens,
+            "token_budget": self.budget,
+            "token_fill_ratio": tokens / (len(token_counts) * self.budget) if token_counts else 0.0,
+        }
+
+    def _split_long_sentence(self, start, end, first, last, token_starts, token_ends):
+        count = last - first
+        if count <= self.budget:
+            return [(start, end, count)]
+        pieces = []
+        for piece_first in range(first, last, self.budget):
+            piece_last = min(piece_first + self.budget, last)
+            pieces.append((token_starts[piece_first], token_ends[piece_last - 1], piece_last - piece_first))
+        return pieces
+
+    def _overlap(self, previous: list, next_tokens: int) -> list:
+        """Sentences carried over from the previous chunk, never crowding out the next one"""
+        if not self.overlap_sentences:
+            return []
+        carried = previous[-self.overlap_sentences:]
+        while carried and sum(u[2] for u in carried) + next_tokens > self.budget // 2:
+            carried = carried[1:]
+        return carried
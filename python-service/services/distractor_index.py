@@ -0,0 +1,210 @@
+import os
+import sys
+import threading
+import zipfile
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from config import settings
+from services.persistence import BackgroundSaver, write_npz
+
+# Options this similar are treated as the same answer written differently
+NEAR_DUPLICATE = 0.9
+
+
+class _LabelIndex:
+    """Entity texts for one label with their character n-gram counts as rows of a sparse matrix"""
+    def __init__(self, n_features: int):
+        self.texts: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.counts = sp.csr_matrix((0, n_features), dtype=np.float32)
+        self.doc_freq = np.zeros(n_features, dtype=np.float32)
+
+    def add(self, texts: List[str], counts: sp.csr_matrix):
+        for text in texts:
+            self.rows[text.lower()] = len(self.texts)
+            self.texts.append(text)
+        self.counts = sp.vstack([self.counts, counts], format="csr")
+        self.doc_freq += np.asarray((counts > 0).sum(axis=0)).ravel()
+
+    def drop_oldest(self, count: int):
+        dropped = self.counts[:count]
+        self.doc_freq -= np.asarray((dropped > 0).sum(axis=0)).ravel()
+        self.counts = self.counts[count:]
+        self.texts = self.texts[count:]
+        self.rows = {text.lower(): i for i, text in enumerate(self.texts)}
+
+
+class DistractorIndex:
+    """
+    Entities seen in processed documents, grouped by label, for picking
+    similar-but-wrong quiz options.
+
+    Each entity text is a row of character n-gram counts (hashed to a fixed
+    width). Weighting the rows by the per-label IDF and taking cosine
+    similarity against the correct answers finds the closest entities of the
+    same label for a whole batch of questions in one sparse matrix product.
+    New documents are added incrementally. Each label keeps its most recent
+    entities, and the index is persisted to a local .npz file (in the
+    background, every save_every new entities).
+    """
+    def __init__(self, path: Optional[str] = None, n_features: int = None, max_per_label: int = None,
+                 save_every: int = None):
+        self.path = path
+        self.n_features = n_features or settings.DISTRACTOR_HASH_FEATURES
+        self.max_per_label = max_per_label or settings.DISTRACTOR_MAX_PER_LABEL
+        self.save_every = save_every or settings.DISTRACTOR_SAVE_EVERY
+
+        self._hasher = HashingVectorizer(
+            analyzer="char_wb", ngram_range=(2, 4), n_features=self.n_features,
+            alternate_sign=False, norm=None, dtype=np.float32
+        )
+        self._labels: Dict[str, _LabelIndex] = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._saver = BackgroundSaver("distractor index", self._write)
+        self._load()
+
+    def add(self, entities: Dict[str, Iterable[str]]):
+        """Add entity texts grouped by label; texts already indexed are skipped"""
+        added = 0
+        with self._lock:
+            for label, texts in entities.items():
+                index = self._labels.get(label)
+                if index is None:
+                    index = self._labels[label] = _LabelIndex(self.n_features)
+                new = []
+                seen = set()
+                for text in texts:
+                    key = text.strip().lower()
+                    if key and key not in index.rows and key not in seen:
+                        seen.add(key)
+                        new.append(text.strip())
+                if not new:
+                    continue
+                index.add(new, self._hasher.transform(new))
+                overflow = len(index.texts) - self.max_per_label
+                if overflow > 0:
+                    index.drop_oldest(overflow)
+                added += len(new)
+            self._unsaved += added
+            should_save = self.path and added and self._unsaved >= self.save_every
+
+        if should_save:
+            self._saver.schedule()
+
+    def similar(self, label: str, answers: List[str], num: int = 3,
+                prefer: Iterable[str] = ()) -> List[List[str]]:
+        """
+        For each answer, the num most similar entities of the same label that
+        are not the answer itself (or a near-duplicate or substring of it).
+        Entities in prefer (e.g. from the same document) get a small boost.
+        """
+        if not answers:
+            return []
+        with self._lock:
+            index = self._labels.get(label)
+            if index is None or not index.texts:
+                return [[] for _ in answers]
+            # add() appends to index.texts in place (and updates doc_freq), so
+            # score against a copy that matches this counts matrix
+            counts = index.counts
+            texts = list(index.texts)
+            idf = np.log((1 + len(texts)) / (1 + index.doc_freq)) + 1
+
+        weights = sp.diags(idf.astype(np.float32))
+        matrix = counts @ weights
+        queries = self._hasher.transform(answers) @ weights
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        query_norms = np.sqrt(np.asarray(queries.multiply(queries).sum(axis=1)).ravel())
+        # answers x entities cosine similarities in one product
+        scores = (queries @ matrix.T).toarray()
+        scores /= np.outer(np.maximum(query_norms, 1e-9), np.maximum(norms, 1e-9))
+
+        ranking = scores
+        preferred = {text.lower() for text in prefer}
+        if preferred:
+            ranking = scores + np.array([0.1 if text.lower() in preferred else 0.0 for text in texts])
+
+        results = []
+        for similarity, rank, answer in zip(scores, ranking, answers):
+            answer_key = answer.lower()
+            picked = []
+            for i in np.argsort(-rank, kind="stable"):
+                candidate = texts[i].lower()
+                if similarity[i] >= NEAR_DUPLICATE:
+                    continue
+                if candidate in answer_key or answer_key in candidate:
+                    continue
+                picked.append(texts[i])
+                if len(picked) == num:
+                    break
+            results.append(picked)
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {label: len(index.texts) for label, index in self._labels.items()}
+
+    def reload(self):
+        """Replace the in-memory index with the saved one, if there is one"""
+        self._load()
+
+    def stop_saving(self):
+        """Keep additions in memory only (serve.py: every worker but the one that saves)"""
+        self.path = None
+
+    def save(self) -> bool:
+        """Write the index now; False if the write failed"""
+        if not self.path:
+            return True
+        return self._saver.save()
+
+    def _write(self):
+        arrays = {}
+        with self._lock:
+            for n, (label, index) in enumerate(self._labels.items()):
+                arrays[f"label_{n}"] = np.array(label)
+                arrays[f"texts_{n}"] = np.array(index.texts, dtype=str)
+                arrays[f"data_{n}"] = index.counts.data
+                arrays[f"indices_{n}"] = index.counts.indices
+                arrays[f"indptr_{n}"] = index.counts.indptr
+                arrays[f"doc_freq_{n}"] = index.doc_freq.copy()
+            arrays["n_features"] = np.array(self.n_features)
+            self._unsaved = 0
+        write_npz(self.path, **arrays)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        labels = {}
+        try:
+            with np.load(self.path) as data:
+                if int(data["n_features"]) != self.n_features:
+                    print(f"Ignoring distractor index at {self.path}: built with a different DISTRACTOR_HASH_FEATURES",
+                          file=sys.stderr)
+                    return
+                n = 0
+                while f"label_{n}" in data:
+                    index = _LabelIndex(self.n_features)
+                    index.texts = [str(text) for text in data[f"texts_{n}"]]
+                    index.rows = {text.lower(): i for i, text in enumerate(index.texts)}
+                    index.counts = sp.csr_matrix(
+                        (data[f"data_{n}"], data[f"indices_{n}"], data[f"indptr_{n}"]),
+                        shape=(len(index.texts), self.n_features)
+                    )
+                    index.doc_freq = data[f"doc_freq_{n}"].astype(np.float32)
+                    labels[str(data[f"label_{n}"])] = index
+                    n += 1
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            # A truncated or corrupt index must not stop the service from starting
+            print(f"Ignoring unreadable distractor index at {self.path}, starting empty: {e}", file=sys.stderr)
+            return
+        with self._lock:
+            self._labels = labels
+            self._unsaved = 0
+
+distractor_index = DistractorIndex(path=os.path.join(settings.MODEL_CACHE_DIR, "distractor_index.npz"))
@@ -0,0 +1,199 @@
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict
+
+from config import settings
+from services.metrics import record_queue_wait
+from services.request_context import checkpoint, current_request, priority
+
+
+class ServiceOverloaded(Exception):
+    """Raised when an endpoint's pending queue is full or a worker cannot be obtained in time"""
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class PrioritySlots:
+    """
+    A counting semaphore whose waiters are woken lowest priority value first
+    instead of first come, first served.
+    """
+    def __init__(self, count: int):
+        self._free = count
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: float):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as the wait was abandoned: pass it on
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
+
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+
+class WorkerPool:
+    """
+    Runs blocking spaCy / transformers calls on a fixed pool of worker threads
+    so the event loop stays free for other requests (including /health).
+
+    Each endpoint has a bounded number of pending requests (queued plus
+    running). Requests beyond that bound are rejected with 429, and requests
+    that cannot get a worker within QUEUE_TIMEOUT_S are rejected with 503,
+    both carrying a Retry-After estimate, instead of piling up until the
+    caller's own timeout fires.
+
+    Queued work is started cheapest first (see RequestContext.priority), so
+    short requests are not stuck behind book-length ones, and work for a
+    request that is past its deadline or abandoned is skipped.
+    """
+    def __init__(self, max_workers: int = None, queue_limits: Dict[str, int] = None,
+                 default_queue_limit: int = None, queue_timeout: float = None):
+        self.max_workers = max_workers or settings.WORKER_POOL_SIZE
+        self.queue_limits = queue_limits if queue_limits is not None else settings.QUEUE_LIMITS
+        self.default_queue_limit = default_queue_limit or settings.QUEUE_LIMIT_DEFAULT
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.QUEUE_TIMEOUT_S
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="worker")
+        self._slots = None
+        self._loop = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        self._avg_duration: Dict[str, float] = {}
+
+    def pending(self, endpoint: str) -> int:
+        return self._pending.get(endpoint, 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "waiting": self._slots.waiting() if self._slots is not None else 0,
+                "pending": dict(self._pending),
+                "avg_duration_s": dict(self._avg_duration),
+            }
+
+    @asynccontextmanager
+    async def admit(self, endpoint: str):
+        """Count a request against its endpoint's pending limit for the duration of the block"""
+        self._acquire_pending(endpoint)
+        self._set_task(endpoint)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release_pending(endpoint, time.monotonic() - start)
+
+    async def run(self, endpoint: str, fn: Callable, *args, **kwargs):
+        """Admit a request for endpoint and run fn(*args, **kwargs) on a worker thread"""
+        self._acquire_pending(endpoint)
+        self._set_task(endpoint)
+        start = time.monotonic()
+        try:
+            future = await self._start(endpoint, fn, *args, **kwargs)
+        except BaseException:
+            self._release_pending(endpoint, time.monotonic() - start)
+            raise
+        # The worker thread cannot be interrupted, so the request stays pending
+        # until it finishes or reaches a checkpoint() even if the caller stops waiting.
+        future.add_done_callback(lambda _: self._release_pending(endpoint, time.monotonic() - start))
+        return await asyncio.shield(future)
+
+    async def submit(self, fn: Callable, *args, **kwargs):
+        """Run fn on a worker thread without counting it against an endpoint (for work inside an admitted request)"""
+        future = await self._start(None, fn, *args, **kwargs)
+        return await asyncio.shield(future)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _start(self, endpoint, fn, *args, **kwargs) -> asyncio.Future:
+        slots = self._get_slots()
+        waited = time.perf_counter()
+        try:
+            await asyncio.wait_for(slots.acquire(priority()), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            record_queue_wait(time.perf_counter() - waited)
+            raise ServiceOverloaded(
+                503, self._retry_after(endpoint), "No worker available, try again later"
+            )
+        record_queue_wait(time.perf_counter() - waited)
+
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context so the request's stage timings follow it
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self.executor, functools.partial(context.run, _run_checked, fn, *args, **kwargs))
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def _get_slots(self) -> PrioritySlots:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._loop = loop
+            self._slots = PrioritySlots(self.max_workers)
+        return self._slots
+
+    @staticmethod
+    def _set_task(endpoint: str):
+        request = current_request()
+        if request is not None:
+            request.task = endpoint
+
+    def _acquire_pending(self, endpoint: str):
+        limit = self.queue_limits.get(endpoint, self.default_queue_limit)
+        with self._lock:
+            pending = self._pending.get(endpoint, 0)
+            if pending >= limit:
+                raise ServiceOverloaded(
+                    429, self._retry_after(endpoint), f"Too many pending {endpoint} requests, try again later"
+                )
+            self._pending[endpoint] = pending + 1
+
+    def _release_pending(self, endpoint: str, duration: float):
+        with self._lock:
+            self._pending[endpoint] = max(0, self._pending.get(endpoint, 0) - 1)
+            # Exponentially weighted average of how long a request holds its slot
+            previous = self._avg_duration.get(endpoint)
+            self._avg_duration[endpoint] = duration if previous is None else 0.8 * previous + 0.2 * duration
+
+    def _retry_after(self, endpoint) -> int:
+        avg = self._avg_duration.get(endpoint, 1.0) if endpoint else 1.0
+        backlog = self._pending.get(endpoint, 0) if endpoint else self.max_workers
+        return max(1, math.ceil(avg * backlog / self.max_workers))
+
+
+def _run_checked(fn: Callable, *args, **kwargs):
+    # The request may have timed out or been abandoned while this was queued
+    checkpoint()
+    return fn(*args, **kwargs)
+
+
+worker_pool = WorkerPool()
@@ -0,0 +1,157 @@
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from config import settings
+from services.metrics import stage
+from utils.document import Document, word_count
+
+# Sentences shorter than this are rarely worth extracting on their own
+MIN_SENTENCE_WORDS = 5
+# Sentences at least this similar to one already in the summary add nothing new
+REDUNDANT_SIMILARITY = 0.8
+DAMPING = 0.85
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-6
+# SUMMARY_LENGTHS are in model tokens; English averages about 0.75 words per token
+WORDS_PER_TOKEN = 0.75
+# Longer "sentences" (unpunctuated transcripts, PDF extracts) are ranked as
+# windows of this many words, so no single one can exceed the summary budget
+MAX_SENTENCE_WORDS = 60
+WORD = re.compile(r'\S+')
+
+
+class ExtractiveSummarizer:
+    """
+    TextRank over TF-IDF sentence vectors: a summary made of the document's
+    most central sentences, kept in their original order.
+
+    Sentences are l2-normalized TF-IDF rows of a sparse matrix X, and the
+    edge weights are their cosine similarities X X^T. That matrix is never
+    built: each power iteration multiplies by X^T and then X, so time and
+    memory grow with the number of words rather than with sentences squared.
+    """
+    def summarize(self, text: Union[str, Document], length: str = "medium") -> Dict:
+        document = Document.of(text)
+        length_params = settings.SUMMARY_LENGTHS.get(length, settings.SUMMARY_LENGTHS["medium"])
+        with stage("preprocess"):
+            text = document.text
+            min_words, max_words = self._budget(length_params, document.word_count)
+            window = max(1, min(MAX_SENTENCE_WORDS, int(max_words)))
+            sentences = [
+                text[start:end]
+                for span in document.sentence_spans()
+                for start, end in self._split_long(text, span, window)
+            ]
+        with stage("extract"):
+            scores, vectors = self.score_sentences(sentences)
+            picked = self._select(sentences, scores, vectors, min_words, max_words)
+        return {
+            "summary": " ".join(sentences[i] for i in picked),
+            "sentence_count": len(sentences),
+        }
+
+    def score_sentences(self, sentences: List[str]) -> Tuple[np.ndarray, Optional[sp.csr_matrix]]:
+        """
+        TextRank score of each sentence, and its l2-normalized TF-IDF row
+        (None when there is nothing to compare; every sentence then scores 1)
+        """
+        scores = np.zeros(len(sentences))
+        candidates = [i for i, sentence in enumerate(sentences) if word_count(sentence) >= MIN_SENTENCE_WORDS]
+        if not candidates:
+            candidates = list(range(len(sentences)))
+        if len(candidates) < 2:
+            scores[candidates] = 1.0
+            return scores, None
+
+        vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True)
+        try:
+            matrix = vectorizer.fit_transform([sentences[i] for i in candidates])
+        except ValueError:
+            # Only stop words: nothing to rank on
+            scores[candidates] = 1.0
+            return scores, None
+
+        scores[candidates] = self._textrank(matrix)
+        # Rows for every sentence, empty for the ones too short to rank
+        placement = sp.csr_matrix(
+            (np.ones(len(candidates)), (candidates, np.arange(len(candidates)))),
+            shape=(len(sentences), len(candidates))
+        )
+        return scores, (placement @ matrix).tocsr()
+
+    @staticmethod
+    def _textrank(matrix) -> np.ndarray:
+        n = matrix.shape[0]
+        # Cosine similarity of every sentence with itself is its squared norm
+        # (1, or 0 for sentences with no scored terms); drop those self-loops
+        self_similarity = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        degree = matrix @ (matrix.T @ np.ones(n)) - self_similarity
+        dangling = degree <= 1e-12
+        inverse_degree = np.where(dangling, 0.0, 1.0 / np.maximum(degree, 1e-12))
+
+        rank = np.full(n, 1.0 / n)
+        for _ in range(MAX_ITERATIONS):
+            weighted = rank * inverse_degree
+            spread = matrix @ (matrix.T @ weighted) - self_similarity * weighted
+            # Sentences linked to nothing hand their rank out evenly
+            updated = (1 - DAMPING) / n + DAMPING * (spread + rank[dangling].sum() / n)
+            if np.abs(updated - rank).sum() < TOLERANCE:
+                rank = updated
+                break
+            rank = updated
+        return rank
+
+    @staticmethod
+    def _budget(length_params: dict, total_words: int) -> Tuple[float, float]:
+        """(min, max) words of the summary"""
+        min_words = length_params["min_length"] * WORDS_PER_TOKEN
+        # Never more than about half of a short input
+        max_words = min(length_params["max_length"] * WORDS_PER_TOKEN, max(min_words, total_words / 2))
+        return min_words, max_words
+
+    @staticmethod
+    def _split_long(text: str, span: Tuple[int, int], window: int) -> List[Tuple[int, int]]:
+        """A sentence span, or consecutive spans of at most window words if it is longer"""
+        start, end = span
+        words = [(match.start(), match.end()) for match in WORD.finditer(text, start, end)]
+        if len(words) <= window:
+            return [span]
+        return [(words[i][0], words[min(i + window, len(words)) - 1][1]) for i in range(0, len(words), window)]
+
+    @staticmethod
+    def _select(sentences: List[str], scores: np.ndarray, vectors: Optional[sp.csr_matrix],
+                min_words: float, max_words: float) -> List[int]:
+        """
+        Highest scoring sentences that fit the word budget, in document order.
+        Sentences nearly identical to one already picked are skipped, since
+        repeated passages would otherwise score highest of all.
+        """
+        picked = []
+        seen = set()
+        words = 0
+        for i in np.argsort(-scores, kind="stable"):
+            if scores[i] <= 0:
+                break
+            key = sentences[i].lower()
+            if key in seen:
+                continue
+            count = word_count(sentences[i])
+            if words + count > max_words:
+                if words >= min_words:
+                    break
+                continue
+            if vectors is not None and picked:
+                similarity = (vectors[picked] @ vectors[i].T).toarray()
+                if similarity.size and similarity.max() >= REDUNDANT_SIMILARITY:
+                    continue
+            picked.append(int(i))
+            seen.add(key)
+            words += count
+        return sorted(picked)
+
+
+extractive_summarizer = ExtractiveSummarizer()
@@ -1,6 +1,16 @@
-import spacy
+import hashlib
+import heapq
 import random
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+from config import settings
+from services.analysis_cache import analysis_cache
+from services.metrics import stage
+from services.nlp_provider import get_pipeline
+from services.paragraphs import split_paragraphs
+from services.request_context import checkpoint
+
+# Entity types that make good card fronts; bare numbers and amounts rarely do
+PREFERRED_LABELS = {"PERSON", "ORG", "GPE", "LOC", "NORP", "FAC", "EVENT", "WORK_OF_ART", "LAW", "PRODUCT", "LANGUAGE", "DATE"}
 
 class FlashcardGenerator:
     """
@@ -13,16 +23,11 @@ class FlashcardGenerator:
     """
     def __init__(self):
         """
-        Initializes the FlashcardGenerator by loading the spaCy model.
-        It will download the model if it is not found.
+        Initializes the FlashcardGenerator with the shared spaCy pipeline,
+        running only sentence segmentation and NER.
+        Fails with ModelUnavailable if the model is not installed.
         """
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("Downloading required spaCy model 'en_core_web_sm'...")
-            print("This is a one-time setup and may take a moment.")
-            spacy.cli.download("en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+        self.nlp = get_pipeline("flashcards")
 
     def _create_cards_from_entities(self, doc) -> List[Dict[str, str]]:
         """
@@ -49,13 +54,17 @@ class FlashcardGenerator:
         
         return flashcards
 
-    def generate_flashcards(self, text: str, num_cards: int = 10) -> List[Dict[str, str]]:
+    def generate_flashcards(self, text: str, num_cards: int = 10,
+                            incremental: bool = False, seed: Optional[int] = None) -> List[Dict[str, str]]:
         """
         Generates a list of flashcards from the input text.
 
         Args:
             text (str): The text to process.
             num_cards (int): The maximum number of flashcards to return.
+            incremental (bool): Parse paragraph by paragraph, so a re-upload
+                                with small edits only parses what changed.
+            seed (int): Makes the selection of cards repeatable.
 
         Returns:
             List[Dict[str, str]]: A list of flashcard dictionaries, 
@@ -64,12 +73,130 @@ class FlashcardGenerator:
         if not text or not isinstance(text, str):
             return []
 
-        doc = self.nlp(text)
-        
+        with stage("spacy_parse"):
+            if incremental:
+                doc = analysis_cache.get_paragraph_doc(self.nlp, text)
+            else:
+                doc = analysis_cache.get_doc(self.nlp, text)
+        checkpoint()
+        return self.generate_flashcards_from_doc(doc, num_cards, seed)
+
+    def generate_flashcards_from_doc(self, doc, num_cards: int = 10,
+                                     seed: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Generates flashcards from an already parsed Doc, which needs sentence
+        boundaries and entities (e.g. one parsed for a quiz).
+        """
+        with stage("cards"):
+            return self._select_cards(doc, num_cards, seed)
+
+    def generate_flashcards_streaming(self, text: str, num_cards: int = 10, seed: Optional[int] = None,
+                                      oversample: int = None) -> List[Dict[str, str]]:
+        """
+        Generates flashcards while parsing the text a batch of paragraphs at a
+        time, keeping at most 2 * num_cards candidates in memory.
+
+        Every distinct term gets a pseudo-random priority from the seed and
+        only the num_cards lowest are kept (a bottom-k sample). This makes the
+        result a uniform, repeatable sample of the terms seen. It also means a
+        term seen again, or already dropped, is rejected without keeping a
+        record of every term. Good candidates (see _is_good_card) are
+        preferred, and the others only fill remaining slots. Parsing stops
+        once oversample * num_cards distinct good candidates have been
+        accepted into the sample; 0 reads the whole text.
+
+        Returns:
+            List[Dict[str, str]]: Up to num_cards flashcards.
+        """
+        if not text or not isinstance(text, str) or num_cards <= 0:
+            return []
+        if seed is None:
+            seed = random.getrandbits(64)
+        if oversample is None:
+            oversample = settings.FLASHCARD_OVERSAMPLE
+
+        # Max-heaps (negated priority) of the num_cards lowest-priority candidates
+        good, fallback = [], []
+        kept = set()  # terms currently in either heap
+        good_accepted = 0  # distinct good terms that made it into the heap
+
+        with stage("cards"):
+            paragraphs = split_paragraphs(text)
+            for doc in self.nlp.pipe(paragraphs, batch_size=settings.SPACY_BATCH_SIZE):
+                checkpoint()
+                for sentence in doc.sents:
+                    for entity in sentence.ents:
+                        term = entity.text.strip()
+                        key = term.lower()
+                        if not key or key in kept:
+                            continue
+                        is_good = self._is_good_card(entity, sentence)
+                        heap = good if is_good else fallback
+                        priority = self._priority(seed, key)
+                        if len(heap) < num_cards:
+                            heapq.heappush(heap, (-priority, key, term, sentence.text.strip()))
+                        elif priority < -heap[0][0]:
+                            _, evicted, _, _ = heapq.heapreplace(heap, (-priority, key, term, sentence.text.strip()))
+                            kept.discard(evicted)
+                        else:
+                            continue
+                        kept.add(key)
+                        # A term rejected or evicted once never gets in later (the
+                        # heap's bound only falls), so each accepted term counts once
+                        good_accepted += is_good
+                if oversample and good_accepted >= oversample * num_cards:
+                    break
+
+        selected = sorted(good, reverse=True) + sorted(fallback, reverse=True)
+        return [{"front": term, "back": back} for _, _, term, back in selected[:num_cards]]
+
+    def generate_flashcards_batch(self, texts: List[str], num_cards: int = 10,
+                                  batch_size: int = None,
+                                  n_process: int = None) -> List[Union[List[Dict[str, str]], Exception]]:
+        """
+        Generates flashcards for many texts, parsing them with one nlp.pipe pass.
+
+        Returns:
+            A list aligned with texts holding each document's cards, or the
+            exception raised while processing that document.
+        """
+        with stage("spacy_parse"):
+            docs = analysis_cache.get_docs(self.nlp, texts, batch_size=batch_size, n_process=n_process,
+                                           return_exceptions=True)
+        checkpoint()
+        results = []
+        for doc in docs:
+            if isinstance(doc, Exception):
+                results.append(doc)
+                continue
+            try:
+                with stage("cards"):
+                    results.append(self._select_cards(doc, num_cards))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    @staticmethod
+    def _priority(seed: int, key: str) -> int:
+        digest = hashlib.blake2b(f"{seed}\0{key}".encode("utf-8"), digest_size=8)
+        return int.from_bytes(digest.digest(), "little")
+
+    @staticmethod
+    def _is_good_card(entity, sentence) -> bool:
+        """A card is good if its term is a named thing and its sentence says more than just the term"""
+        back = sentence.text.strip()
+        return (
+            entity.label_ in PREFERRED_LABELS
+            and len(entity.text.strip()) > 1
+            and 40 <= len(back) <= 300
+            and len(back) > 2 * len(entity.text)
+        )
+
+    def _select_cards(self, doc, num_cards: int, seed: Optional[int] = None) -> List[Dict[str, str]]:
         all_possible_cards = self._create_cards_from_entities(doc)
         
         # Shuffle the cards to get a random selection
-        random.shuffle(all_possible_cards)
+        random.Random(seed).shuffle(all_possible_cards)
         
         # Return the requested number of cards
         return all_possible_cards[:num_cards]
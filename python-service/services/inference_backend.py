@@ -0,0 +1,46 @@
+import sys
+
+import torch
+from transformers import AutoModelForSeq2SeqLM
+
+BACKENDS = ("fp32", "int8", "bf16")
+
+
+def cpu_supports_bf16() -> bool:
+    """True when the CPU has native bf16 instructions (AVX512-BF16 or AMX)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def apply_backend(model, backend: str):
+    """
+    Convert a full-precision model for the requested CPU backend.
+
+    Returns the converted model and the backend actually used; bf16 falls
+    back to fp32 on CPUs without native bf16 support, where it would be
+    emulated and slower than full precision.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    model.eval()
+    if backend == "int8":
+        # Dynamic quantization: Linear weights are stored as int8 and
+        # activations are quantized on the fly, no calibration data needed
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8), backend
+    if backend == "bf16":
+        if not cpu_supports_bf16():
+            print("bf16 requested but this CPU has no native bf16 support, using fp32", file=sys.stderr)
+            return model, "fp32"
+        return model.to(torch.bfloat16), backend
+    return model, backend
+
+
+def load_seq2seq(model_name_or_path: str, backend: str = "fp32", **kwargs):
+    """Load a seq2seq model and convert it for the given backend"""
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name_or_path, **kwargs)
+    return apply_backend(model, backend)
@@ -0,0 +1,111 @@
+import codecs
+import os
+import unicodedata
+from typing import AsyncIterator, BinaryIO, Iterator, Optional
+
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+
+# Size of the blocks read from a text upload
+READ_BLOCK_BYTES = 64 * 1024
+# Room in a multipart body for boundaries, part headers and small form fields
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+PDF_CONTENT_TYPES = {"application/pdf"}
+TEXT_CONTENT_TYPES = {"text/plain", "text/markdown"}
+TEXT_EXTENSIONS = {".txt", ".md"}
+
+
+class DocumentError(Exception):
+    """Raised when an uploaded document cannot be read"""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def document_kind(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Return "pdf" or "text" for an upload, from its content type or file extension"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if content_type in PDF_CONTENT_TYPES or extension == ".pdf":
+        return "pdf"
+    if content_type in TEXT_CONTENT_TYPES or extension in TEXT_EXTENSIONS:
+        return "text"
+    raise DocumentError(415, "Only PDF and plain text files are supported")
+
+
+async def read_upload_form(request: Request, max_bytes: int) -> FormData:
+    """
+    Parse a multipart upload whose file may be at most max_bytes, refusing
+    it (413) from its Content-Length, or as soon as more than that has
+    arrived, instead of after the whole body has been spooled to disk.
+    The caller closes the returned form.
+    """
+    limit = max_bytes + FORM_OVERHEAD_BYTES
+    too_large = DocumentError(413, f"Files are limited to {max_bytes // (1024 * 1024)} MB")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise too_large
+
+    async def limited() -> AsyncIterator[bytes]:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > limit:
+                raise too_large
+            yield chunk
+
+    try:
+        form = await MultiPartParser(request.headers, limited()).parse()
+    except MultiPartException as e:
+        raise DocumentError(400, f"Could not read the upload: {e.message}")
+    upload = form.get("file")
+    if upload is not None and not isinstance(upload, str) and upload.size is not None and upload.size > max_bytes:
+        await form.close()
+        raise too_large
+    return form
+
+
+def iter_document_text(fileobj: BinaryIO, kind: str) -> Iterator[str]:
+    """
+    Yield the text of an uploaded document piece by piece (page by page for
+    PDFs, block by block for text files) so it never has to be held whole.
+    """
+    pieces = iter_pdf_pages(fileobj) if kind == "pdf" else iter_text_blocks(fileobj)
+    for piece in pieces:
+        yield unicodedata.normalize("NFC", piece)
+
+
+def iter_text_blocks(fileobj: BinaryIO, encoding: str = "utf-8") -> Iterator[str]:
+    # The incremental decoder keeps multi-byte characters split across blocks intact
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while True:
+        block = fileobj.read(READ_BLOCK_BYTES)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_pdf_pages(fileobj: BinaryIO) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise DocumentError(415, "PDF support requires the pypdf package")
+
+    try:
+        reader = PdfReader(fileobj)
+        pages = reader.pages
+        page_count = len(pages)
+    except Exception as e:
+        raise DocumentError(400, f"Could not read PDF: {e}")
+
+    for index in range(page_count):
+        # Pages are parsed on demand, one at a time
+        text = pages[index].extract_text() or ""
+        yield text + "\n"
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import sys
+import threading
+import zipfile
+from collections import Counter, OrderedDict
+from typing import Dict, List
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, ENGLISH_STOP_WORDS
+
+from config import settings
+from services.persistence import BackgroundSaver, write_npz
+
+# Alphanumeric tokens of at least four characters, matching the old filters
+TOKEN_PATTERN = r"(?u)\b[^\W_]{4,}\b"
+
+
+def _single_term(term: str) -> List[str]:
+    return [term]
+
+
+def document_digest(text: str) -> int:
+    """64-bit digest identifying a document whose terms were counted"""
+    return _digest_int(hashlib.sha256(text.encode("utf-8")))
+
+
+def _digest_int(digest) -> int:
+    return int.from_bytes(digest.digest()[:8], "little")
+
+
+class KeywordEngine:
+    """
+    Corpus-level TF-IDF keyword extraction.
+
+    Term counts for a batch of documents come from one CountVectorizer pass
+    (a sparse docs x terms matrix). Document frequencies are kept in a fixed
+    size array indexed by the hashed term, so the IDF table can grow with
+    every processed document without an ever-growing vocabulary, and it is
+    persisted to a local .npz file (in the background, every save_every
+    documents) so it survives restarts.
+
+    Only a document's first appearance is counted: digests of the last
+    max_seen counted documents are kept (and saved with the table), so
+    repeated, re-submitted or fanned-out texts do not pull the IDF toward
+    whatever is requested most.
+    """
+    def __init__(self, path: str = None, n_features: int = None, save_every: int = None, max_seen: int = None):
+        self.path = path
+        self.n_features = n_features or settings.KEYWORD_HASH_FEATURES
+        self.save_every = save_every or settings.KEYWORD_SAVE_EVERY
+        self.max_seen = max_seen or settings.KEYWORD_SEEN_MAX
+
+        self._hasher = HashingVectorizer(
+            n_features=self.n_features, analyzer=_single_term, alternate_sign=False, norm=None
+        )
+        self._lock = threading.Lock()
+        self._doc_freq = np.zeros(self.n_features, dtype=np.int64)
+        self._n_docs = 0
+        self._unsaved = 0
+        # Digests of counted documents, least recently seen first
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._saver = BackgroundSaver("keyword IDF table", self._write)
+        self._load()
+
+    @property
+    def n_docs(self) -> int:
+        return self._n_docs
+
+    def extract(self, text: str, num_keywords: int = 5, update: bool = True) -> List[str]:
+        return self.extract_batch([text], num_keywords, update)[0]
+
+    def accumulator(self) -> "KeywordAccumulator":
+        return KeywordAccumulator(self)
+
+    def extract_batch(self, texts: List[str], num_keywords: int = 5, update: bool = True) -> List[List[str]]:
+        """
+        Top TF-IDF keywords for each text. With update=True the texts not
+        counted before are also added to the corpus statistics before scoring.
+        """
+        fresh = self._first_seen([document_digest(text) for text in texts]) if update else []
+        vectorizer = _vectorizer()
+        try:
+            counts = vectorizer.fit_transform(texts)
+        except ValueError:
+            # Raised when no document contains a single usable token
+            if fresh:
+                with self._lock:
+                    self._n_docs += len(fresh)
+                    self._unsaved += len(fresh)
+            return [[] for _ in texts]
+
+        terms = vectorizer.get_feature_names_out()
+        # Each row of the hashed matrix holds exactly one term, so its indices
+        # line up with the vocabulary order
+        columns = self._hasher.transform(terms).indices
+
+        doc_freq = np.asarray((counts[fresh] > 0).sum(axis=0)).ravel() if fresh else None
+        idf = self._idf(columns, doc_freq, len(fresh))
+
+        scores = counts.multiply(idf).tocsr()
+        keywords = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            row_scores = scores.data[start:end]
+            top = np.argsort(-row_scores, kind="stable")[:num_keywords]
+            keywords.append([terms[i] for i in scores.indices[start:end][top]])
+        return keywords
+
+    def extract_counts(self, counts: Dict[str, int], num_keywords: int = 5, update: bool = True,
+                       digest: int = None) -> List[str]:
+        """
+        Top TF-IDF keywords for one document given as term counts. Its digest
+        (see document_digest) keeps a repeated document from being counted
+        again; without one the document is always counted.
+        """
+        if not counts:
+            return []
+        if update and digest is not None:
+            update = bool(self._first_seen([digest]))
+        terms = list(counts)
+        columns = self._hasher.transform(terms).indices
+        idf = self._idf(columns, np.ones(len(terms), dtype=np.int64) if update else None, 1)
+        scores = np.fromiter(counts.values(), dtype=np.float64, count=len(terms)) * idf
+        top = np.argsort(-scores, kind="stable")[:num_keywords]
+        return [terms[i] for i in top]
+
+    def _first_seen(self, digests: List[int]) -> List[int]:
+        """Positions of the documents not counted before, recording them as counted"""
+        fresh = []
+        with self._lock:
+            for i, digest in enumerate(digests):
+                if digest in self._seen:
+                    self._seen.move_to_end(digest)
+                else:
+                    self._seen[digest] = None
+                    fresh.append(i)
+            while len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+        return fresh
+
+    def _idf(self, columns: np.ndarray, doc_freq: np.ndarray = None, n_docs: int = 0) -> np.ndarray:
+        """IDF for hashed columns, first adding the given document frequencies to the corpus"""
+        with self._lock:
+            if doc_freq is not None:
+                np.add.at(self._doc_freq, columns, doc_freq)
+                self._n_docs += n_docs
+                self._unsaved += n_docs
+            idf = np.log((1 + self._n_docs) / (1 + self._doc_freq[columns])) + 1
+            should_save = self.path and self._unsaved >= self.save_every
+
+        if should_save:
+            self._saver.schedule()
+        return idf
+
+    def reload(self):
+        """Replace the in-memory table with the saved one, if there is one"""
+        self._load()
+
+    def stop_saving(self):
+        """Keep updates in memory only (serve.py: every worker but the one that saves)"""
+        self.path = None
+
+    def save(self) -> bool:
+        """Write the IDF table now; False if the write failed"""
+        if not self.path:
+            return True
+        return self._saver.save()
+
+    def _write(self):
+        with self._lock:
+            doc_freq = self._doc_freq.copy()
+            n_docs = self._n_docs
+            seen = np.fromiter(self._seen, dtype=np.uint64, count=len(self._seen))
+            self._unsaved = 0
+        write_npz(self.path, doc_freq=doc_freq, n_docs=n_docs, seen=seen)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                doc_freq = data["doc_freq"].astype(np.int64)
+                n_docs = int(data["n_docs"])
+                # Tables saved before digests were kept have none
+                seen = data["seen"].tolist() if "seen" in data.files else []
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            # A truncated or corrupt table must not stop the service from starting
+            print(f"Ignoring unreadable keyword IDF table at {self.path}, starting empty: {e}", file=sys.stderr)
+            return
+        if doc_freq.shape[0] != self.n_features:
+            print(f"Ignoring keyword IDF table at {self.path}: built with a different KEYWORD_HASH_FEATURES",
+                  file=sys.stderr)
+            return
+        with self._lock:
+            self._doc_freq = doc_freq
+            self._n_docs = n_docs
+            self._seen = OrderedDict.fromkeys(seen[-self.max_seen:])
+            self._unsaved = 0
+
+
+def _vectorizer() -> CountVectorizer:
+    return CountVectorizer(token_pattern=TOKEN_PATTERN, stop_words=list(ENGLISH_STOP_WORDS))
+
+
+class KeywordAccumulator:
+    """
+    Term counts for a document read in pieces (e.g. an uploaded file),
+    scored against the corpus IDF once the whole document has been seen
+    """
+    def __init__(self, engine: KeywordEngine):
+        self.engine = engine
+        self.counts = Counter()
+        self._analyze = _vectorizer().build_analyzer()
+        self._digest = hashlib.sha256()
+
+    def add(self, text: str):
+        self.counts.update(self._analyze(text))
+        self._digest.update(text.encode("utf-8"))
+
+    def top(self, num_keywords: int = 5, update: bool = True) -> List[str]:
+        return self.engine.extract_counts(self.counts, num_keywords, update, _digest_int(self._digest))
+
+
+keyword_engine = KeywordEngine(path=os.path.join(settings.MODEL_CACHE_DIR, "keyword_idf.npz"))
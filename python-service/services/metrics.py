@@ -0,0 +1,220 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from regex cleanup on small notes up to BART on long documents
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with a fixed label set"""
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_format_value(bound)}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: List[Histogram] = []
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float],
+                  labelnames: Sequence[str] = ()) -> Histogram:
+        histogram = Histogram(name, documentation, buckets, labelnames)
+        self._histograms.append(histogram)
+        return histogram
+
+    def render(self) -> str:
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    "mindmate_request_duration_seconds", "Time to serve a request", SECONDS_BUCKETS, ("endpoint", "status")
+)
+STAGE_SECONDS = metrics.histogram(
+    "mindmate_stage_duration_seconds", "Time spent in each processing stage of a request",
+    SECONDS_BUCKETS, ("endpoint", "stage")
+)
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "mindmate_queue_wait_seconds", "Time a request waited for a worker thread", SECONDS_BUCKETS, ("endpoint",)
+)
+REQUEST_BYTES = metrics.histogram(
+    "mindmate_request_bytes", "Size of the request body", BYTES_BUCKETS, ("endpoint",)
+)
+CHUNK_COUNT = metrics.histogram(
+    "mindmate_summary_chunks", "Number of model-sized chunks a document was split into", COUNT_BUCKETS, ("endpoint",)
+)
+MODEL_BATCH_SECONDS = metrics.histogram(
+    "mindmate_model_batch_duration_seconds", "Time for one batched summarization model call", SECONDS_BUCKETS
+)
+MODEL_BATCH_SIZE = metrics.histogram(
+    "mindmate_model_batch_size", "Number of chunks in one batched summarization model call", COUNT_BUCKETS
+)
+
+
+class RequestTimings:
+    """Stage durations and sizes collected while serving one request"""
+    __slots__ = ("stages", "chunk_counts", "queue_waits", "_lock")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.chunk_counts: List[int] = []
+        self.queue_waits: List[float] = []
+        # Stages can run concurrently on worker threads (e.g. batch endpoints)
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        with self._lock:
+            entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+            if self.queue_waits:
+                entries.append(f"queue;dur={sum(self.queue_waits) * 1000:.1f}")
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def flush(self, endpoint: str):
+        with self._lock:
+            stages = list(self.stages.items())
+            chunk_counts = list(self.chunk_counts)
+            queue_waits = list(self.queue_waits)
+        for name, seconds in stages:
+            STAGE_SECONDS.observe(seconds, endpoint, name)
+        for count in chunk_counts:
+            CHUNK_COUNT.observe(count, endpoint)
+        for seconds in queue_waits:
+            QUEUE_WAIT_SECONDS.observe(seconds, endpoint)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a stage of the current request; a no-op outside a request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add_stage(name, time.perf_counter() - start)
+
+
+def record_chunks(count: int):
+    timings = _current.get()
+    if timings is not None:
+        with timings._lock:
+            timings.chunk_counts.append(count)
+
+
+def record_queue_wait(seconds: float):
+    timings = _current.get()
+    if timings is not None:
+        with timings._lock:
+            timings.queue_waits.append(seconds)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that collects stage timings for each request, adds a
+    Server-Timing header to the response and feeds the histograms once the
+    response is complete. For streamed responses the header carries the
+    stages finished before the first byte; the histograms get all of them.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing(time.perf_counter() - start).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # Label by route template so unknown paths cannot blow up the series count
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, str(status))
+            for name, value in scope.get("headers", []):
+                if name == b"content-length":
+                    try:
+                        REQUEST_BYTES.observe(int(value), endpoint)
+                    except ValueError:
+                        pass
+                    break
+            timings.flush(endpoint)
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from config import settings
+from services.snapshot import snapshot_path
+
+
+class ModelUnavailable(Exception):
+    """Raised when a model or its data files cannot be loaded"""
+    def __init__(self, name: str, detail: str):
+        super().__init__(detail)
+        self.name = name
+        self.detail = detail
+
+
+def require_nltk_data(*resources: str):
+    """
+    Check that NLTK data (e.g. "tokenizers/punkt") is installed. Downloads only
+    when ALLOW_MODEL_DOWNLOAD is set; otherwise missing data is an error.
+    """
+    import nltk
+
+    for resource in resources:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            package = resource.rsplit("/", 1)[-1]
+            if settings.ALLOW_MODEL_DOWNLOAD and nltk.download(package, quiet=True):
+                continue
+            raise ModelUnavailable(
+                f"nltk:{package}",
+                f"NLTK data '{resource}' is not installed, run: python -m nltk.downloader {package}"
+            )
+
+
+def load_spacy_model(name: str):
+    """
+    Load a spaCy pipeline from the model snapshot if it has one, else the
+    installed package, downloading it only when ALLOW_MODEL_DOWNLOAD is set
+    """
+    import spacy
+
+    path = snapshot_path("spacy", name)
+    if path is not None:
+        return spacy.load(path)
+    try:
+        return spacy.load(name)
+    except OSError:
+        if not settings.ALLOW_MODEL_DOWNLOAD:
+            raise ModelUnavailable(name, f"spaCy model '{name}' is not installed, run: python -m spacy download {name}")
+    spacy.cli.download(name)
+    return spacy.load(name)
+
+
+class ModelRegistry:
+    """
+    Loads models on first use (or in a background warm-up) instead of at
+    import time, and records per-model load state and load time for /ready.
+    """
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._status: Dict[str, Dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        if name in self._loaders:
+            return
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+        self._status[name] = {"state": "pending", "load_seconds": None, "error": None}
+
+    def get(self, name: str) -> Any:
+        """Return the loaded model, loading it in the calling thread if needed"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+
+            status = self._status[name]
+            status.update(state="loading", error=None)
+            start = time.perf_counter()
+            try:
+                instance = self._loaders[name]()
+            except ModelUnavailable as e:
+                status.update(state="failed", error=e.detail)
+                raise
+            except Exception as e:
+                status.update(state="failed", error=str(e))
+                raise ModelUnavailable(name, f"Failed to load {name}: {e}") from e
+
+            status.update(state="ready", load_seconds=round(time.perf_counter() - start, 3))
+            self._instances[name] = instance
+            return instance
+
+    async def aget(self, name: str) -> Any:
+        """Like get(), but loads on a worker thread so the event loop keeps serving"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        return await asyncio.to_thread(self.get, name)
+
+    async def warm_up(self):
+        """Load every registered model in the background, one at a time"""
+        for name in list(self._loaders):
+            try:
+                await self.aget(name)
+            except ModelUnavailable as e:
+                print(f"Model '{name}' failed to load: {e.detail}")
+
+    def load_all(self):
+        """Load every registered model in the calling thread (e.g. before forking workers)"""
+        for name in list(self._loaders):
+            try:
+                self.get(name)
+            except ModelUnavailable as e:
+                print(f"Model '{name}' failed to load: {e.detail}")
+
+    def state(self, name: str) -> str:
+        """"pending", "loading", "ready" or "failed", without loading anything"""
+        return self._status[name]["state"]
+
+    def is_ready(self) -> bool:
+        return all(status["state"] == "ready" for status in self._status.values())
+
+    def status(self) -> Dict[str, Dict]:
+        return {name: dict(status) for name, status in self._status.items()}
+
+
+registry = ModelRegistry()
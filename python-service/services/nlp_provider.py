@@ -0,0 +1,122 @@
+import threading
+from typing import Dict, Iterable, List
+
+from services.analysis_cache import analysis_cache
+from services.model_registry import load_spacy_model
+
+SPACY_MODEL = "en_core_web_sm"
+
+# Components each task needs from the shared pipeline; the rest are skipped
+TASK_COMPONENTS = {
+    # POS tags feed _extract_key_concepts, the parser gives sentences and noun chunks for titles
+    "quiz": ["tok2vec", "tagger", "parser", "attribute_ruler", "ner"],
+    # Cards only need entities and the sentences that contain them
+    "flashcards": ["senter", "ner"],
+}
+
+# Used when a pipeline ships without a component a task asks for
+FALLBACK_COMPONENTS = {
+    "senter": ["tok2vec", "parser"],
+}
+
+# Annotations each component leaves on a Doc, used to tell when a Doc parsed
+# for one task already carries everything another task needs
+COMPONENT_ANNOTATIONS = {
+    "tagger": {"tag"},
+    "attribute_ruler": {"pos"},
+    "parser": {"dep", "sents"},
+    "senter": {"sents"},
+    "ner": {"ents"},
+    "lemmatizer": {"lemma"},
+}
+
+# Token attributes holding each annotation, copied when per-paragraph Docs are merged
+ANNOTATION_ATTRS = {
+    "tag": ["TAG"],
+    "pos": ["POS", "MORPH"],
+    "dep": ["HEAD", "DEP"],
+    "sents": ["SENT_START"],
+    "ents": ["ENT_IOB", "ENT_TYPE", "ENT_KB_ID", "ENT_ID"],
+    "lemma": ["LEMMA"],
+}
+
+
+class TaskPipeline:
+    """
+    A view of the shared spaCy pipeline that runs only one task's components.
+    It can be used wherever a Language object is called or piped.
+    """
+    def __init__(self, nlp, task: str, components: List[str]):
+        self.nlp = nlp
+        self.task = task
+        self.pipe_names = [name for name in nlp.pipe_names if name in components]
+        self.disabled = [name for name in nlp.pipe_names if name not in components]
+        self.annotations = set()
+        for name in self.pipe_names:
+            self.annotations |= COMPONENT_ANNOTATIONS.get(name, set())
+        # Pipeline ids whose cached Docs can stand in for this task's (set by NLPProvider)
+        self.reusable_pipeline_ids = []
+        # Only this task's annotations are merged, since reused Docs may carry
+        # extra ones that other Docs in the same merge lack
+        self.doc_attrs = ["ORTH", "NORM"]
+        for annotation in sorted(self.annotations):
+            self.doc_attrs.extend(ANNOTATION_ATTRS.get(annotation, []))
+
+    @property
+    def vocab(self):
+        return self.nlp.vocab
+
+    @property
+    def meta(self):
+        return self.nlp.meta
+
+    def __call__(self, text: str):
+        return self.nlp(text, disable=self.disabled)
+
+    def pipe(self, texts: Iterable[str], **kwargs):
+        return self.nlp.pipe(texts, disable=self.disabled, **kwargs)
+
+
+class NLPProvider:
+    """Loads one spaCy pipeline per process and hands out task-specific views of it"""
+    def __init__(self, model_name: str = SPACY_MODEL):
+        self.nlp = load_spacy_model(model_name)
+        # senter ships disabled; enable it so tasks can pick it instead of the parser
+        if "senter" in self.nlp.disabled:
+            self.nlp.enable_pipe("senter")
+        self._pipelines: Dict[str, TaskPipeline] = {
+            task: TaskPipeline(self.nlp, task, self._resolve(components))
+            for task, components in TASK_COMPONENTS.items()
+        }
+        for pipeline in self._pipelines.values():
+            pipeline.reusable_pipeline_ids = [
+                analysis_cache.pipeline_id(other)
+                for other in self._pipelines.values()
+                if other is not pipeline and other.annotations >= pipeline.annotations
+            ]
+
+    def pipeline_for(self, task: str) -> TaskPipeline:
+        return self._pipelines[task]
+
+    def _resolve(self, components: List[str]) -> List[str]:
+        available = set(self.nlp.component_names)
+        resolved = []
+        for name in components:
+            for candidate in ([name] if name in available else FALLBACK_COMPONENTS.get(name, [])):
+                if candidate in available and candidate not in resolved:
+                    resolved.append(candidate)
+        return resolved
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_pipeline(task: str) -> TaskPipeline:
+    """Task view of the process-wide shared pipeline, loading it on first use"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = NLPProvider()
+    return _provider.pipeline_for(task)
@@ -0,0 +1,68 @@
+import hashlib
+import re
+from typing import Iterator
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+# Paragraphs longer than this (e.g. text pasted without blank lines) are
+# split further at sentence boundaries
+MAX_PARAGRAPH_CHARS = 2000
+# Roughly one unit in ANCHOR_MODULUS is a content-defined boundary
+ANCHOR_MODULUS = 4
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_anchor(text: str, modulus: int = ANCHOR_MODULUS) -> bool:
+    """Whether a unit may end a group, decided by its content alone so the choice survives edits elsewhere"""
+    return int(content_hash(text)[:8], 16) % modulus == 0
+
+
+def split_paragraphs(text: str) -> Iterator[str]:
+    """
+    Split text into stable paragraph units, yielded one at a time so callers
+    can process a long text without holding all of its units. Editing one
+    paragraph leaves the other units byte-for-byte the same, so their cached
+    results stay valid.
+    """
+    for match in _blocks(text):
+        block = match.strip()
+        if not block:
+            continue
+        if len(block) <= MAX_PARAGRAPH_CHARS:
+            yield block
+        else:
+            yield from _split_long_paragraph(block)
+
+
+def _blocks(text: str) -> Iterator[str]:
+    """The text between paragraph breaks, without building a list of them"""
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+
+def _split_long_paragraph(block: str) -> Iterator[str]:
+    """
+    Group sentences into units of up to MAX_PARAGRAPH_CHARS. Once a unit is
+    half full it ends at the next anchor sentence, so group boundaries depend
+    on nearby content rather than on everything before them.
+    """
+    current = []
+    length = 0
+    for sentence in SENTENCE_BREAK.split(block):
+        if current and length + len(sentence) > MAX_PARAGRAPH_CHARS:
+            yield " ".join(current)
+            current, length = [], 0
+        current.append(sentence)
+        length += len(sentence) + 1
+        if length >= MAX_PARAGRAPH_CHARS // 2 and is_anchor(sentence):
+            yield " ".join(current)
+            current, length = [], 0
+    if current:
+        yield " ".join(current)
@@ -0,0 +1,66 @@
+import os
+import threading
+from typing import Callable
+
+import numpy as np
+
+
+def write_npz(path: str, **arrays):
+    """Write arrays to path atomically: to a temporary file first, then renamed over it"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Unique per process and thread, since prefork workers share the file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+    try:
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class BackgroundSaver:
+    """
+    Runs a state snapshot-and-write function off the request path.
+
+    schedule() hands the write to a background thread, so the request that
+    crosses a save threshold neither waits for it nor fails because of it;
+    I/O errors (disk full, read-only MODEL_CACHE_DIR) are reported and the
+    data stays in memory until the next save. Writes are serialized and the
+    write function takes its snapshot inside them, so a newer snapshot is
+    always written after an older one.
+    """
+    def __init__(self, name: str, write: Callable[[], None]):
+        self.name = name
+        self._write = write
+        self._write_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._scheduled = False
+
+    def schedule(self):
+        """Save in the background, unless a save is already waiting to start"""
+        with self._state_lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        threading.Thread(target=self._run, name=f"save {self.name}", daemon=True).start()
+
+    def save(self) -> bool:
+        """Save now in the calling thread; False if the write failed"""
+        with self._write_lock:
+            try:
+                self._write()
+                return True
+            except OSError as e:
+                print(f"Could not save {self.name}: {e}")
+                return False
+
+    def _run(self):
+        with self._state_lock:
+            # Changes made from here on need another save, which may be scheduled now
+            self._scheduled = False
+        self.save()
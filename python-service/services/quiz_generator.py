@@ -1,53 +1,116 @@
 
 import random
 import re
-from typing import List, Dict
+from typing import List, Dict, Union
 import nltk
 from nltk.tokenize import sent_tokenize
-import spacy
 from utils.text_processor import TextProcessor
-
-try:
-    nlp = spacy.load("en_core_web_sm")
-except:
-    import subprocess
-    subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
-    nlp = spacy.load("en_core_web_sm")
+from services.analysis_cache import analysis_cache
+from services.distractor_index import distractor_index
+from services.metrics import stage
+from services.nlp_provider import get_pipeline
+from services.request_context import checkpoint
+
+# Entity labels that make fill-in-the-blank questions
+MULTIPLE_CHOICE_LABELS = ["PERSON", "ORG", "GPE", "DATE"]
+# Last-resort options when neither the document nor the index has enough entities
+FALLBACK_DISTRACTORS = ["John Smith", "London", "2020"]
+FALLBACK_FAKES = ["XYZ", "1999", "Unknown Corp"]
 
 class QuizGenerator:
     def __init__(self):
+        self.nlp = get_pipeline("quiz")
         self.text_processor = TextProcessor()
 
     def generate_quiz(self, text: str, num_questions: int = 10,
-                     difficulty: str = "medium", question_types: List[str] = None) -> Dict:
+                     difficulty: str = "medium", question_types: List[str] = None,
+                     incremental: bool = False) -> Dict:
+        """
+        With incremental=True the text is parsed paragraph by paragraph, so a
+        re-upload with small edits only parses the paragraphs that changed.
+        """
         if question_types is None:
             question_types = ["multiple_choice", "true_false"]
 
-        doc = nlp(text)
-        sentences = [sent.text.strip() for sent in doc.sents if 8 < len(sent.text) < 180]
+        with stage("spacy_parse"):
+            if incremental:
+                doc = analysis_cache.get_paragraph_doc(self.nlp, text)
+            else:
+                doc = analysis_cache.get_doc(self.nlp, text)
+        checkpoint()
+        return self.generate_quiz_from_doc(doc, num_questions, question_types)
 
-        entities = self._extract_entities(doc)
+    def generate_quiz_from_doc(self, doc, num_questions: int = 10, question_types: List[str] = None) -> Dict:
+        """Generate a quiz from an already parsed Doc (e.g. one shared with flashcard generation)"""
+        if question_types is None:
+            question_types = ["multiple_choice", "true_false"]
+        with stage("questions"):
+            return self._build_quiz(doc, num_questions, question_types)
+
+    def generate_quizzes(self, texts: List[str], num_questions: int = 10,
+                         difficulty: str = "medium", question_types: List[str] = None,
+                         batch_size: int = None, n_process: int = None) -> List[Union[Dict, Exception]]:
+        """
+        Generate one quiz per text, parsing all texts with a single nlp.pipe pass.
+        A document that fails yields its exception instead of a quiz.
+        """
+        if question_types is None:
+            question_types = ["multiple_choice", "true_false"]
+
+        with stage("spacy_parse"):
+            docs = analysis_cache.get_docs(self.nlp, texts, batch_size=batch_size, n_process=n_process,
+                                           return_exceptions=True)
+        checkpoint()
+        results = []
+        for doc in docs:
+            if isinstance(doc, Exception):
+                results.append(doc)
+                continue
+            try:
+                with stage("questions"):
+                    results.append(self._build_quiz(doc, num_questions, question_types))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _build_quiz(self, doc, num_questions: int, question_types: List[str]) -> Dict:
+        # Work from the sentence spans of the single document parse; entities
+        # for each sentence are then available as sent.ents without re-parsing.
+        sentences = [sent for sent in doc.sents if 8 < len(sent.text) < 180]
+
+        entity_index = self._index_entities(doc)
         key_concepts = self._extract_key_concepts(doc)
+        # Grow the shared index first so this document's entities are candidates too
+        distractor_index.add(entity_index)
 
         questions = []
 
         if "multiple_choice" in question_types:
-            questions.extend(self._generate_multiple_choice(sentences, entities, num_questions // 2))
+            questions.extend(self._generate_multiple_choice(sentences, entity_index, num_questions // 2))
 
         if "true_false" in question_types:
-            questions.extend(self._generate_true_false(sentences, entities, num_questions // 2))
+            checkpoint()
+            questions.extend(self._generate_true_false(sentences, entity_index, num_questions // 2))
 
         random.shuffle(questions)
 
         return {
-            "title": self._generate_title(text),
+            "title": self._generate_title(doc),
             "description": f"Quiz with {len(questions)} questions.",
             "questions": questions[:num_questions],
             "tags": key_concepts[:5]
         }
 
-    def _extract_entities(self, doc) -> List[Dict]:
-        return [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
+    def _index_entities(self, doc) -> Dict[str, List[str]]:
+        """Group the distinct entity texts of a document by label"""
+        index = {}
+        seen = set()
+        for ent in doc.ents:
+            key = (ent.label_, ent.text)
+            if key not in seen:
+                seen.add(key)
+                index.setdefault(ent.label_, []).append(ent.text)
+        return index
 
     def _extract_key_concepts(self, doc) -> List[str]:
         concepts = [token.text for token in doc if token.pos_ in ["NOUN", "PROPN"] and not token.is_stop]
@@ -56,71 +119,111 @@ class QuizGenerator:
             freq[word] = freq.get(word, 0) + 1
         return sorted(freq, key=freq.get, reverse=True)[:10]
 
-    def _generate_multiple_choice(self, sentences, entities, num) -> List[Dict]:
-        questions = []
+    def _pick_distractors(self, entity_index, entities, num=3) -> List[List[str]]:
+        """
+        Similar-but-wrong options for each entity, looked up in the distractor
+        index with one similarity query per label, preferring entities from
+        this document and padding from the document's own entities if needed.
+        """
+        by_label = {}
+        for i, ent in enumerate(entities):
+            by_label.setdefault(ent.label_, []).append(i)
+
+        options = [[] for _ in entities]
+        for label, positions in by_label.items():
+            answers = [entities[i].text for i in positions]
+            similar = distractor_index.similar(label, answers, num, prefer=entity_index.get(label, []))
+            for i, picked in zip(positions, similar):
+                options[i] = picked
+
+        for ent, picked in zip(entities, options):
+            if len(picked) < num:
+                candidates = [text for text in entity_index.get(ent.label_, [])
+                              if text != ent.text and text not in picked]
+                picked.extend(random.sample(candidates, min(len(candidates), num - len(picked))))
+        return options
+
+    def _generate_multiple_choice(self, sentences, entity_index, num) -> List[Dict]:
+        blanks = []
         for sent in sentences:
-            doc = nlp(sent)
-            for ent in doc.ents:
-                if ent.label_ in ["PERSON", "ORG", "GPE", "DATE"]:
-                    question = sent.replace(ent.text, "_____")
-                    correct = ent.text
-                    distractors = [e["text"] for e in entities if e["label"] == ent.label_ and e["text"] != correct]
-                    distractors = list(set(distractors))[:3]
-                    while len(distractors) < 3:
-                        distractors.append(random.choice(["John Smith", "London", "2020"]))
-                    options = [correct] + distractors[:3]
-                    random.shuffle(options)
-                    questions.append({
-                        "question": f"Fill in the blank: {question}",
-                        "type": "multiple_choice",
-                        "options": options,
-                        "correct_answer": correct,
-                        "explanation": f"The correct answer is {correct}."
-                    })
+            for ent in sent.ents:
+                if ent.label_ in MULTIPLE_CHOICE_LABELS:
+                    blanks.append((sent, ent))
                     break
-            if len(questions) >= num:
+            if len(blanks) >= num:
                 break
+
+        distractors = self._pick_distractors(entity_index, [ent for _, ent in blanks])
+        questions = []
+        for (sent, ent), picked in zip(blanks, distractors):
+            question = sent.text.strip().replace(ent.text, "_____")
+            correct = ent.text
+            while len(picked) < 3:
+                picked.append(random.choice(FALLBACK_DISTRACTORS))
+            options = [correct] + picked[:3]
+            random.shuffle(options)
+            questions.append({
+                "question": f"Fill in the blank: {question}",
+                "type": "multiple_choice",
+                "options": options,
+                "correct_answer": correct,
+                "explanation": f"The correct answer is {correct}."
+            })
         return questions
 
-    def _generate_true_false(self, sentences, entities, num) -> List[Dict]:
+    def _generate_true_false(self, sentences, entity_index, num) -> List[Dict]:
+        picked = random.sample(sentences, min(len(sentences), num * 2))
+        make_false = [sent for sent in picked if random.random() <= 0.5]
+        false_versions = self._modify_to_false(make_false, entity_index)
+
         questions = []
-        for sent in random.sample(sentences, min(len(sentences), num * 2)):
-            is_true = random.random() > 0.5
-            if is_true:
+        for sent in picked:
+            sent_text = sent.text.strip()
+            if sent not in false_versions:
                 questions.append({
-                    "question": f"True or False: {sent}",
+                    "question": f"True or False: {sent_text}",
                     "type": "true_false",
                     "options": ["True", "False"],
                     "correct_answer": "True",
                     "explanation": "Directly from the source."
                 })
             else:
-                false_sent = self._modify_to_false(sent, entities)
+                false_sent = false_versions[sent]
                 if false_sent:
                     questions.append({
                         "question": f"True or False: {false_sent}",
                         "type": "true_false",
                         "options": ["True", "False"],
                         "correct_answer": "False",
-                        "explanation": f"Original: {sent}"
+                        "explanation": f"Original: {sent_text}"
                     })
             if len(questions) >= num:
                 break
         return questions
 
-    def _modify_to_false(self, sentence, entities):
-        for ent in entities:
-            if ent["text"] in sentence:
-                fake = random.choice(["XYZ", "1999", "Unknown Corp"])
-                return sentence.replace(ent["text"], fake)
-        return None
-
-    def _generate_title(self, text: str) -> str:
-        doc = nlp(text[:300])
-        for ent in doc.ents:
+    def _modify_to_false(self, sentences, entity_index) -> Dict:
+        """
+        Map each sentence to a false version with its first entity swapped for
+        a similar entity of the same label (None if it has no entities)
+        """
+        with_entities = [sent for sent in sentences if sent.ents]
+        replacements = self._pick_distractors(entity_index, [sent.ents[0] for sent in with_entities], num=1)
+
+        false_versions = {sent: None for sent in sentences}
+        for sent, picked in zip(with_entities, replacements):
+            fake = picked[0] if picked else random.choice(FALLBACK_FAKES)
+            false_versions[sent] = sent.text.strip().replace(sent.ents[0].text, fake)
+        return false_versions
+
+    def _generate_title(self, doc) -> str:
+        # Look at the opening of the already-parsed document instead of re-parsing it
+        head = doc.char_span(0, min(300, len(doc.text)), alignment_mode="contract")
+        if head is None:
+            return "Generated Quiz"
+        for ent in head.ents:
             if ent.label_ in ["ORG", "PERSON", "GPE"]:
                 return f"Quiz: {ent.text}"
-        for chunk in doc.noun_chunks:
+        for chunk in head.noun_chunks:
             if 5 < len(chunk.text) < 30:
                 return f"Quiz: {chunk.text.title()}"
         return "Generated Quiz"
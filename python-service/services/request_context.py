@@ -0,0 +1,191 @@
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from config import settings
+
+DEADLINE_HEADER = b"x-request-deadline-ms"
+
+
+class RequestCancelled(Exception):
+    """Raised at a checkpoint once the request is past its deadline or the client has gone away"""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class RequestContext:
+    """Deadline, cancellation state and size of the request being served"""
+    __slots__ = ("started", "deadline", "size", "task", "cancelled")
+
+    def __init__(self, deadline: Optional[float] = None, size: int = 0):
+        self.started = time.monotonic()
+        self.deadline = deadline
+        self.size = size
+        # Set by the worker pool to the endpoint the request was admitted for
+        self.task: Optional[str] = None
+        self.cancelled: Optional[RequestCancelled] = None
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def cancel(self, status_code: int, detail: str):
+        if self.cancelled is None:
+            self.cancelled = RequestCancelled(status_code, detail)
+
+    def check(self):
+        if self.cancelled is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(504, "Request deadline exceeded")
+        if self.cancelled is not None:
+            raise self.cancelled
+
+    def priority(self) -> float:
+        """
+        Queue priority, lower runs first: arrival time plus the estimated cost
+        of the work. A cheap request overtakes an expensive one that arrived
+        less than the difference in cost earlier, and nothing starves.
+        """
+        per_kb = settings.TASK_COST_S_PER_KB.get(self.task, settings.TASK_COST_S_PER_KB_DEFAULT)
+        return self.started + self.size / 1024 * per_kb
+
+
+_current: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def current_request() -> Optional[RequestContext]:
+    return _current.get()
+
+
+def checkpoint():
+    """Stop dead work: raise RequestCancelled if the current request is past its deadline or abandoned"""
+    request = _current.get()
+    if request is not None:
+        request.check()
+
+
+def priority() -> float:
+    """Queue priority of the current request; first come, first served outside a request"""
+    request = _current.get()
+    return request.priority() if request is not None else time.monotonic()
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware that gives each request a deadline and stops its work
+    once the deadline passes or the client disconnects.
+
+    The deadline comes from the X-Request-Deadline-Ms header (the caller's
+    remaining time budget) or REQUEST_DEADLINE_S. When it passes, or the
+    client goes away, the request's task is cancelled, which also drops its
+    chunks still queued for the summarizer; code running on worker threads
+    stops at its next checkpoint(). A request that times out before
+    responding gets a 504.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestContext(deadline=self._deadline(scope), size=self._content_length(scope))
+        token = _current.set(request)
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        response = {"started": False, "complete": False}
+
+        def stop(status_code: int, detail: str):
+            if request.cancelled is None and not response["complete"]:
+                request.cancel(status_code, detail)
+                task.cancel()
+
+        timer = None
+        if request.deadline is not None:
+            timer = loop.call_later(max(0.0, request.remaining()), stop, 504, "Request deadline exceeded")
+
+        body_read = False
+        disconnected = asyncio.Event()
+        watcher = None
+
+        async def watch_disconnect():
+            # Once the body has been read, the next message can only be a disconnect
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+                stop(499, "Client disconnected")
+
+        async def receive_with_watch():
+            nonlocal body_read, watcher
+            if body_read:
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                body_read = True
+                watcher = asyncio.ensure_future(watch_disconnect())
+            return message
+
+        async def send_tracked(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["complete"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_with_watch, send_tracked)
+        except (asyncio.CancelledError, RequestCancelled):
+            if request.cancelled is None:
+                raise
+            if hasattr(task, "uncancel"):
+                while task.uncancel():
+                    pass
+            await self._finish(request.cancelled, response, disconnected.is_set(), send)
+        finally:
+            _current.reset(token)
+            if timer is not None:
+                timer.cancel()
+            if watcher is not None:
+                watcher.cancel()
+
+    async def _finish(self, cancelled: RequestCancelled, response: dict, disconnected: bool, send):
+        if disconnected or response["complete"]:
+            return
+        if not response["started"]:
+            body = json.dumps({"detail": cancelled.detail}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": cancelled.status_code,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+        else:
+            # A streamed response was cut short: end it cleanly
+            await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    def _deadline(scope) -> Optional[float]:
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER:
+                try:
+                    # The caller's remaining budget: 0 or less means it is already spent
+                    return time.monotonic() + max(0.0, float(value) / 1000)
+                except ValueError:
+                    break
+        # REQUEST_DEADLINE_S = 0 means no deadline
+        budget = settings.REQUEST_DEADLINE_S
+        return time.monotonic() + budget if budget > 0 else None
+
+    @staticmethod
+    def _content_length(scope) -> int:
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return 0
+        return 0
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import settings
+
+
+class ResultCache:
+    """
+    Persistent cache of deterministic generation results with single-flight
+    deduplication.
+
+    Results are stored as JSON in a local SQLite file. Entries expire after
+    ttl seconds, and the least recently used entries are evicted once the
+    stored payloads exceed max_bytes. Concurrent requests for the same key
+    share one in-flight computation instead of each running the model.
+
+    The total size of the stored payloads is kept in the database itself
+    (by triggers), so prefork workers sharing the file all evict against
+    the same total rather than each counting only its own inserts.
+    """
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO results_size (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM results"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS results_size_insert AFTER INSERT ON results "
+            "BEGIN UPDATE results_size SET bytes = bytes + NEW.size WHERE id = 0; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS results_size_delete AFTER DELETE ON results "
+            "BEGIN UPDATE results_size SET bytes = bytes - OLD.size WHERE id = 0; END"
+        )
+        self._conn.commit()
+
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+
+    def reopen(self):
+        """Open a fresh connection in a forked worker; SQLite connections must not be used across fork()"""
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._in_flight = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """Hash the parts that determine a result (model, parameters, text hash, ...)"""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._delete(key)
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict):
+        payload = json.dumps(value)
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._delete(key)
+            self._conn.execute(
+                "INSERT INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Return the cached result for key, joining an identical in-flight
+        computation if there is one, and computing (then storing) it otherwise.
+        The returned dict has a "cached" flag telling whether the model ran.
+        """
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            self.hits += 1
+            return {**cached, "cached": True}
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.shared += 1
+            await asyncio.wait({in_flight})
+            if in_flight.cancelled():
+                # The request that owned the computation went away; take over
+                return await self.get_or_compute(key, compute)
+            return {**in_flight.result(), "cached": True}
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting on it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            await asyncio.to_thread(self.put, key, result)
+            return {**result, "cached": False}
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            size = self._stored_bytes()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "evictions": self.evictions,
+            "in_flight": len(self._in_flight),
+        }
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT bytes FROM results_size WHERE id = 0").fetchone()[0]
+
+    def _delete(self, key: str):
+        self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def _evict(self, now: float):
+        # Runs in the write transaction put() opened, so the total is not
+        # changed by another process between reading and evicting
+        self._conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+        size = self._stored_bytes()
+        while size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM results ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, row_size in rows:
+                if size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                size -= row_size
+                self.evictions += 1
+
+
+summary_cache = ResultCache(
+    settings.RESULT_CACHE_PATH or os.path.join(settings.MODEL_CACHE_DIR, "summary_cache.sqlite3"),
+    max_bytes=settings.RESULT_CACHE_MAX_MB * 1024 * 1024,
+    ttl=settings.RESULT_CACHE_TTL_S,
+) if settings.RESULT_CACHE_ENABLED else None
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+from config import settings
+
+# Bumped when the layout of a snapshot directory changes; older snapshots are ignored
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+# File in the snapshot root naming the snapshot to load
+CURRENT = "current"
+COMPONENTS = ("summarizer", "spacy")
+
+
+def snapshot_root() -> str:
+    return settings.MODEL_SNAPSHOT_DIR or os.path.join(settings.MODEL_CACHE_DIR, "snapshots")
+
+
+def list_snapshots(root: str = None) -> List[str]:
+    root = root or snapshot_root()
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if os.path.isfile(os.path.join(root, name, MANIFEST))
+    )
+
+
+def current_snapshot(root: str = None) -> Optional[str]:
+    """Name of the snapshot to load: MODEL_SNAPSHOT_VERSION, or the one the current file points to"""
+    if settings.MODEL_SNAPSHOT_VERSION:
+        return settings.MODEL_SNAPSHOT_VERSION
+    try:
+        with open(os.path.join(root or snapshot_root(), CURRENT)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def snapshot_path(component: str, model_name: str) -> Optional[str]:
+    """
+    Directory of a component ("summarizer" or "spacy") in the active
+    snapshot, or None when there is no usable snapshot of model_name and the
+    caller should load it the usual way. A snapshot whose manifest is
+    missing, of another format version, or whose files have changed size
+    since export is skipped with a warning.
+    """
+    if not settings.MODEL_SNAPSHOT_ENABLED:
+        return None
+    name = current_snapshot()
+    if name is None:
+        return None
+    path = os.path.join(snapshot_root(), name)
+    manifest = read_manifest(path)
+    if manifest is None:
+        print(f"Model snapshot '{name}' has no readable manifest, loading {model_name} without it")
+        return None
+    if manifest.get("format_version") != FORMAT_VERSION:
+        print(f"Model snapshot '{name}' has format version {manifest.get('format_version')}, "
+              f"expected {FORMAT_VERSION}; loading {model_name} without it")
+        return None
+    entry = manifest.get("components", {}).get(component)
+    if entry is None or entry.get("model") != model_name:
+        return None
+    component_path = os.path.join(path, component)
+    for file in entry.get("files", []):
+        file_path = os.path.join(component_path, file["path"])
+        if not os.path.isfile(file_path) or os.path.getsize(file_path) != file["size"]:
+            print(f"Model snapshot '{name}' is incomplete ({file['path']}), loading {model_name} without it")
+            return None
+    return component_path
+
+
+def _file_entries(path: str) -> List[Dict]:
+    """Relative path, size and sha256 of every file under path"""
+    entries = []
+    for directory, _, files in os.walk(path):
+        for file in sorted(files):
+            file_path = os.path.join(directory, file)
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            entries.append({
+                "path": os.path.relpath(file_path, path),
+                "size": os.path.getsize(file_path),
+                "sha256": digest.hexdigest(),
+            })
+    return sorted(entries, key=lambda entry: entry["path"])
+
+
+def _link_or_copy(src: str, dst: str):
+    # Snapshot files are never modified in place, so a hard link is as good as a copy
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def export_snapshot(root: str = None, name: str = None, components=COMPONENTS) -> str:
+    """
+    Export the summarizer (weights as safetensors, with its tokenizer) and the
+    spaCy pipeline into a new versioned directory under root, then make it
+    the current snapshot. Models are read from the local caches, or from the
+    hub when ALLOW_MODEL_DOWNLOAD is set. Returns the snapshot's path.
+
+    When only some components are exported, the others are carried over
+    from the current snapshot (hard-linked where possible). If it does not
+    have them either, the new snapshot is kept but not made current, since
+    the service would quietly fall back to the hub for what it lacks.
+
+    The snapshot is written to a temporary directory and renamed into place,
+    so a failed or interrupted export never leaves a partial snapshot behind.
+    """
+    import spacy
+    import torch
+    import transformers
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+    from services.model_registry import load_spacy_model
+    from services.nlp_provider import SPACY_MODEL
+
+    root = root or snapshot_root()
+    name = name or time.strftime("%Y%m%d-%H%M%S")
+    if name != os.path.basename(name) or name.startswith(".") or name == CURRENT:
+        raise ValueError(f"Invalid snapshot name '{name}'")
+    final_path = os.path.join(root, name)
+    if os.path.exists(final_path):
+        raise FileExistsError(f"Snapshot '{name}' already exists in {root}")
+    tmp_path = os.path.join(root, f".{name}.tmp-{os.getpid()}")
+    os.makedirs(tmp_path)
+    previous = current_snapshot(root)
+    previous_manifest = read_manifest(os.path.join(root, previous)) if previous else None
+    if previous_manifest is not None and previous_manifest.get("format_version") != FORMAT_VERSION:
+        previous_manifest = None
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "name": name,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "versions": {
+            "transformers": transformers.__version__,
+            "torch": torch.__version__,
+            "spacy": spacy.__version__,
+        },
+        "components": {},
+    }
+    offline = not settings.ALLOW_MODEL_DOWNLOAD
+    try:
+        if "summarizer" in components:
+            path = os.path.join(tmp_path, "summarizer")
+            model_name = settings.SUMMARIZATION_MODEL
+            tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=offline)
+            # Full precision: SUMMARY_BACKEND conversions happen at load time
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name, local_files_only=offline)
+            model.save_pretrained(path, safe_serialization=True)
+            tokenizer.save_pretrained(path)
+            manifest["components"]["summarizer"] = {"model": model_name, "files": _file_entries(path)}
+            del model
+
+        if "spacy" in components:
+            path = os.path.join(tmp_path, "spacy")
+            nlp = load_spacy_model(SPACY_MODEL)
+            nlp.to_disk(path)
+            manifest["components"]["spacy"] = {
+                "model": SPACY_MODEL,
+                "version": nlp.meta.get("version"),
+                "files": _file_entries(path),
+            }
+
+        for component in COMPONENTS:
+            if component in components or previous_manifest is None:
+                continue
+            entry = previous_manifest.get("components", {}).get(component)
+            if entry is None:
+                continue
+            shutil.copytree(os.path.join(root, previous, component), os.path.join(tmp_path, component),
+                            copy_function=_link_or_copy)
+            manifest["components"][component] = {**entry, "copied_from": previous}
+
+        with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp_path, final_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    missing = [component for component in COMPONENTS if component not in manifest["components"]]
+    if missing:
+        print(f"Snapshot '{name}' has no {', '.join(missing)}, so it was not made current "
+              f"(use `python snapshot.py use {name}` to switch anyway)")
+    else:
+        set_current(name, root)
+    return final_path
+
+
+def set_current(name: str, root: str = None):
+    """Point the current file at a snapshot; the switch is atomic for processes starting up"""
+    root = root or snapshot_root()
+    if name not in list_snapshots(root):
+        raise FileNotFoundError(f"No snapshot '{name}' in {root}")
+    tmp = os.path.join(root, f"{CURRENT}.tmp-{os.getpid()}")
+    with open(tmp, "w") as f:
+        f.write(name + "\n")
+    os.replace(tmp, os.path.join(root, CURRENT))
+
+
+def remove_snapshot(name: str, root: str = None):
+    root = root or snapshot_root()
+    # Only ever delete a directory listed as a snapshot (never "..", "", "/...")
+    if name not in list_snapshots(root):
+        raise ValueError(f"No snapshot '{name}' in {root}")
+    if name == current_snapshot(root):
+        raise ValueError(f"Snapshot '{name}' is the current snapshot")
+    shutil.rmtree(os.path.join(root, name))
@@ -0,0 +1,29 @@
+from fastapi.responses import StreamingResponse
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for a request admitted to the worker pool before the
+    response started (so an overloaded service can still answer 429).
+
+    The admission is released when the response ends, however it ends. If
+    the client disconnects before the body starts, Starlette cancels the
+    response without ever running the body iterator, so releasing it from
+    the iterator's own finally block would leak the endpoint's pending slot.
+    """
+    def __init__(self, admission, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # A body iterator paused at a yield is only closed when it is
+            # garbage collected; close it now so its cleanup runs
+            close = getattr(self.body_iterator, "aclose", None)
+            try:
+                if close is not None:
+                    await close()
+            finally:
+                await self.admission.__aexit__(None, None, None)
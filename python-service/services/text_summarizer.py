@@ -1,112 +1,451 @@
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import re
-from typing import List
+from transformers import pipeline, AutoTokenizer
+import time
+import hashlib
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Tuple, Union
 from config import settings
-
-# Download required NLTK data
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-except:
-    pass
+from services.batching import MicroBatcher
+from services.chunker import SentenceChunker
+from services.result_cache import ResultCache, summary_cache
+from services.inference_backend import load_seq2seq
+from services.keyword_engine import keyword_engine
+from services.paragraphs import split_paragraphs
+from services.metrics import stage, record_chunks, MODEL_BATCH_SECONDS, MODEL_BATCH_SIZE
+from services.request_context import checkpoint
+from services.snapshot import snapshot_path
+from utils.document import Document, SPECIAL_CHARS, WHITESPACE, normalize
 
 class TextSummarizer:
     def __init__(self):
         self.model_name = settings.SUMMARIZATION_MODEL
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
+        source = snapshot_path("summarizer", self.model_name)
+        if source is not None:
+            # A plain directory, so no hub or cache lookups; the safetensors
+            # weights are memory-mapped rather than unpickled
+            print(f"Loading {self.model_name} from snapshot {source}")
+            self.tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=True)
+            self.model, self.backend = load_seq2seq(
+                source, settings.SUMMARY_BACKEND, local_files_only=True, use_safetensors=True
+            )
+        else:
+            # Never reach out to the hub unless downloads are explicitly allowed
+            offline = not settings.ALLOW_MODEL_DOWNLOAD
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, local_files_only=offline)
+            self.model, self.backend = load_seq2seq(
+                self.model_name, settings.SUMMARY_BACKEND, local_files_only=offline
+            )
         self.summarizer = pipeline(
             "summarization",
             model=self.model,
             tokenizer=self.tokenizer,
             device=-1  # Use CPU, set to 0 for GPU
         )
+        self.chunker = SentenceChunker(self.tokenizer)
+        # Chunks from concurrent requests are grouped into one pipeline call
+        self.batcher = MicroBatcher(
+            self._process_batch,
+            max_batch_size=settings.SUMMARY_BATCH_MAX_SIZE,
+            max_wait_ms=settings.SUMMARY_BATCH_MAX_WAIT_MS
+        )
     
     def preprocess_text(self, text: str) -> str:
         """Clean and preprocess text"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s\.\,\!\?\-]', '', text)
-        return text.strip()
+        return normalize(text)
     
-    def summarize(self, text: str, length: str = "medium") -> str:
+    def preprocess_stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        """
+        preprocess_text for text that arrives in pieces. Joining the output
+        gives the same text as preprocess_text on the whole input.
+        """
+        previous_space = True  # also drops leading whitespace, like strip()
+        held = ""  # trailing spaces, only emitted once more text follows
+        emitted = False
+        for piece in pieces:
+            piece = WHITESPACE.sub(' ', piece)
+            # A whitespace run can span two pieces
+            if previous_space and piece.startswith(' '):
+                piece = piece[1:]
+            if not piece:
+                continue
+            previous_space = piece.endswith(' ')
+            piece = held + SPECIAL_CHARS.sub('', piece)
+            if not emitted:
+                piece = piece.lstrip()
+            text = piece.rstrip()
+            held = piece[len(text):]
+            if text:
+                emitted = True
+                yield text
+    
+    def summarize(self, text: Union[str, Document], length: str = "medium") -> str:
         """Generate summary of given text"""
-        text = self.preprocess_text(text)
+        chunks, length_params, _ = self._prepare(Document.of(text), length)
+        with stage("generate"):
+            summaries = self._summarize_batch(chunks, length_params)
+            
+            # Combine summaries if multiple chunks
+            final_summary = ' '.join(summaries)
+            
+            # If combined summary is too long, summarize again
+            if self._needs_second_pass(final_summary, length_params):
+                final_summary = self._summarize_batch([final_summary], length_params)[0]
         
-        # Get length parameters
+        return final_summary
+    
+    async def summarize_async(self, text: Union[str, Document], length: str = "medium") -> Dict:
+        """
+        Generate summary of given text, batching model calls with other in-flight requests.
+        Returns the summary together with the chunking stats for the document.
+        """
+        chunks, length_params, chunk_stats = await asyncio.to_thread(self._prepare, Document.of(text), length)
+        group = tuple(sorted(length_params.items()))
+        with stage("generate"):
+            summaries = await self.batcher.submit_many(chunks, group)
+            
+            final_summary = ' '.join(summaries)
+            
+            if self._needs_second_pass(final_summary, length_params):
+                final_summary = await self.batcher.submit(final_summary, group)
+        
+        return {"summary": final_summary, **chunk_stats}
+    
+    async def summarize_cached(self, text: Union[str, Document], length: str = "medium",
+                               mode: str = "standard") -> Dict:
+        """
+        Summarize through the persistent result cache. Generation is deterministic
+        (do_sample=False), so identical requests reuse the stored result and
+        concurrent identical requests share one model run.
+        """
+        document = Document.of(text)
+        if summary_cache is None:
+            return {**await self._summarize_mode(document, length, mode), "cached": False}
+        key = await asyncio.to_thread(self.cache_key, document, length, mode)
+        return await summary_cache.get_or_compute(key, lambda: self._summarize_mode(document, length, mode))
+    
+    async def summarize_many(self, texts: List[Union[str, Document]], length: str = "medium",
+                             mode: str = "standard") -> List[Union[Dict, Exception]]:
+        """
+        Summarize several documents at once. Their chunks all go through the
+        batcher together, so the model sees full batches; a document that
+        fails yields its exception instead of a result.
+        """
+        return await asyncio.gather(
+            *(self.summarize_cached(text, length, mode) for text in texts),
+            return_exceptions=True
+        )
+    
+    def cache_key(self, text: Union[str, Document], length: str, mode: str) -> str:
+        if length not in settings.SUMMARY_LENGTHS:
+            length = "medium"
+        return ResultCache.make_key(
+            model=self.model_name,
+            backend=self.backend,
+            length=length,
+            params={**settings.SUMMARY_LENGTHS[length], "do_sample": False},
+            chunking={"tokens": self.chunker.budget, "overlap": self.chunker.overlap_sentences},
+            mode=mode,
+            text=hashlib.sha256(Document.of(text).text.encode("utf-8")).hexdigest()
+        )
+    
+    async def _summarize_mode(self, document: Document, length: str, mode: str) -> Dict:
+        if mode == "hierarchical":
+            return await self.summarize_hierarchical(document, length)
+        if mode == "incremental":
+            return await self.summarize_incremental(document.raw, length)
+        return await self.summarize_async(document, length)
+    
+    async def summarize_stream(self, text: Union[str, Document], length: str = "medium") -> AsyncIterator[Dict]:
+        """
+        Yield each chunk summary as soon as it is ready, then the combined summary.
+        Chunk events arrive in completion order and carry their chunk index.
+        """
+        chunks, length_params, chunk_stats = await asyncio.to_thread(self._prepare, Document.of(text), length)
+        group = tuple(sorted(length_params.items()))
+        
+        async def summarize_chunk(index: int, chunk: str):
+            with stage("generate"):
+                return index, await self.batcher.submit(chunk, group)
+        
+        tasks = [asyncio.ensure_future(summarize_chunk(i, chunk)) for i, chunk in enumerate(chunks)]
+        try:
+            summaries = [None] * len(chunks)
+            for next_done in asyncio.as_completed(tasks):
+                index, summary = await next_done
+                summaries[index] = summary
+                yield {"type": "chunk", "index": index, "total": len(chunks), "summary": summary}
+            
+            final_summary = ' '.join(summaries)
+            if self._needs_second_pass(final_summary, length_params):
+                with stage("generate"):
+                    final_summary = await self.batcher.submit(final_summary, group)
+            
+            yield {"type": "summary", "summary": final_summary, **chunk_stats}
+        finally:
+            # Stop queued chunks when the consumer goes away (e.g. client disconnect)
+            for task in tasks:
+                task.cancel()
+    
+    async def summarize_hierarchical(self, text: Union[str, Document], length: str = "medium") -> Dict:
+        """
+        Map-reduce summary for book-length inputs.
+
+        Chunk summaries are reduced level by level in fixed-size groups until
+        one summary is left, so no model input ever exceeds the token window.
+        Groups are reduced as soon as they fill up, which keeps at most one
+        partial group per level in memory instead of every chunk summary.
+        """
+        document = Document.of(text)
+        with stage("preprocess"):
+            text = await asyncio.to_thread(lambda: document.text)
         length_params = settings.SUMMARY_LENGTHS.get(length, settings.SUMMARY_LENGTHS["medium"])
+        with stage("chunking"):
+            spans = await asyncio.to_thread(document.chunk_spans, self.chunker)
+        record_chunks(len(spans))
         
-        # Split text into chunks if too long
-        max_chunk_size = 1024
-        chunks = self._split_text(text, max_chunk_size)
-        
-        summaries = []
-        for chunk in chunks:
-            summary = self.summarizer(
-                chunk,
-                max_length=length_params["max_length"],
-                min_length=length_params["min_length"],
-                do_sample=False
-            )
-            summaries.append(summary[0]['summary_text'])
+        # Map stage: summarize chunks a window at a time so the batcher runs
+        # them in parallel without materializing every chunk up front
+        window = self._map_window(length_params)
+        
+        async def windows():
+            for i in range(0, len(spans), window):
+                yield [text[start:end] for start, end, _ in spans[i:i + window]]
         
-        # Combine summaries if multiple chunks
-        final_summary = ' '.join(summaries)
+        final_summary, levels = await self._reduce_tree(windows(), length_params)
+        return {
+            "summary": final_summary,
+            **self.chunker.stats(spans),
+            "depth": len(levels),
+            "levels": levels,
+        }
+    
+    async def summarize_incremental(self, text: str, length: str = "medium") -> Dict:
+        """
+        Summarize with chunks built from whole paragraphs and cache each chunk's
+        summary on its own. When an edited copy of a document comes back, only
+        the chunks around the edits are summarized again; the rest come from
+        the result cache.
+        """
+        length_params = settings.SUMMARY_LENGTHS.get(length, settings.SUMMARY_LENGTHS["medium"])
+        with stage("preprocess"):
+            paragraphs = [self.preprocess_text(p) for p in split_paragraphs(text)]
+            paragraphs = [p for p in paragraphs if p]
+        with stage("chunking"):
+            chunks, chunk_stats = await asyncio.to_thread(self.chunker.chunk_paragraphs, paragraphs)
+        record_chunks(len(chunks))
         
-        # If combined summary is too long, summarize again
-        if len(final_summary.split()) > length_params["max_length"] * 1.5:
-            final_summary = self.summarizer(
-                final_summary,
-                max_length=length_params["max_length"],
-                min_length=length_params["min_length"],
-                do_sample=False
-            )[0]['summary_text']
+        with stage("generate"):
+            results = await asyncio.gather(*(self._summarize_chunk_cached(chunk, length_params) for chunk in chunks))
+            final_summary = ' '.join(result["summary"] for result in results)
+            if self._needs_second_pass(final_summary, length_params):
+                final_summary = (await self._summarize_chunk_cached(final_summary, length_params))["summary"]
         
-        return final_summary
+        return {
+            "summary": final_summary,
+            **chunk_stats,
+            "reused_chunks": sum(1 for result in results if result["cached"]),
+        }
     
-    def _split_text(self, text: str, max_size: int) -> List[str]:
-        """Split text into chunks"""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_size = 0
+    async def _summarize_chunk_cached(self, chunk: str, length_params: dict) -> Dict:
+        group = tuple(sorted(length_params.items()))
         
-        for word in words:
-            current_size += len(word) + 1
-            if current_size > max_size:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-                current_size = len(word)
-            else:
-                current_chunk.append(word)
+        async def compute():
+            return {"summary": await self.batcher.submit(chunk, group)}
         
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        if summary_cache is None:
+            return {**await compute(), "cached": False}
+        key = ResultCache.make_key(
+            model=self.model_name,
+            backend=self.backend,
+            params={**length_params, "do_sample": False},
+            chunk=hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+        )
+        return await summary_cache.get_or_compute(key, compute)
+    
+    async def summarize_pieces(self, pieces: Iterable[str], length: str = "medium",
+                               on_chunk: Callable[[str], None] = None) -> Dict:
+        """
+        Hierarchical summary of a document that arrives in pieces, such as the
+        pages of an uploaded PDF. Pieces are normalized and chunked as they are
+        read, and each window of chunks is summarized while the next is read,
+        so memory stays flat however large the document is. on_chunk, if
+        given, is called with every chunk (e.g. to collect keywords).
+        """
+        length_params = settings.SUMMARY_LENGTHS.get(length, settings.SUMMARY_LENGTHS["medium"])
+        window = self._map_window(length_params)
+        words = [0]
+        token_counts = []
+        
+        def count_words(normalized: Iterable[str]) -> Iterator[str]:
+            in_word = False
+            for piece in normalized:
+                count = len(piece.split())
+                # A word split across two pieces is only counted once
+                if count and in_word and not piece[0].isspace():
+                    count -= 1
+                words[0] += count
+                in_word = not piece[-1].isspace()
+                yield piece
+        
+        chunks = self.chunker.chunk_stream(count_words(self.preprocess_stream(pieces)))
+        # Set when the summary stops early (e.g. the request was cancelled), so
+        # a read in progress on a worker thread stops instead of running on
+        # against a file that is about to be closed
+        stopped = threading.Event()
+        
+        def read_window() -> List[str]:
+            batch = []
+            for chunk, count in chunks:
+                if stopped.is_set():
+                    return []
+                checkpoint()
+                token_counts.append(count)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                batch.append(chunk)
+                if len(batch) == window:
+                    break
+            return batch
+        
+        async def windows():
+            # Read the next window on a worker thread while this one is summarized
+            with stage("ingest"):
+                upcoming = asyncio.ensure_future(asyncio.to_thread(read_window))
+                batch = await upcoming
+            try:
+                while batch:
+                    upcoming = asyncio.ensure_future(asyncio.to_thread(read_window))
+                    yield batch
+                    with stage("ingest"):
+                        batch = await upcoming
+            finally:
+                stopped.set()
+                # Cancelling the future would not stop the thread; wait for it
+                # to see the flag so nothing reads the file after we return
+                await asyncio.wait({upcoming})
+                if not upcoming.cancelled():
+                    upcoming.exception()
         
-        return chunks
+        reader = windows()
+        try:
+            final_summary, levels = await self._reduce_tree(reader, length_params)
+        finally:
+            await reader.aclose()
+        record_chunks(len(token_counts))
+        return {
+            "summary": final_summary,
+            "original_length": words[0],
+            **self.chunker.stats_for_counts(token_counts),
+            "depth": len(levels),
+            "levels": levels,
+        }
     
-    def extract_keywords(self, text: str, num_keywords: int = 5) -> List[str]:
-        """Extract keywords from text"""
-        text = self.preprocess_text(text.lower())
+    async def _reduce_tree(self, windows: AsyncIterator[List[str]], length_params: dict) -> Tuple[str, List[Dict]]:
+        """
+        Summarize windows of chunks and reduce the summaries level by level in
+        fixed-size groups until one is left. Returns the final summary and the
+        model calls and time spent on each level.
+        """
+        group = tuple(sorted(length_params.items()))
+        group_size = self._reduce_group_size(length_params)
+        
+        buffers = []  # buffers[k]: summaries at level k waiting to be grouped
+        levels = []   # levels[k]: model calls and time spent producing level k
         
-        # Tokenize
-        tokens = word_tokenize(text)
+        async def run_level(level: int, inputs: List[str]) -> List[str]:
+            checkpoint()
+            while len(levels) <= level:
+                levels.append({"level": len(levels), "calls": 0, "seconds": 0.0})
+            start = time.perf_counter()
+            with stage("generate"):
+                outputs = await self.batcher.submit_many(inputs, group)
+            levels[level]["calls"] += len(inputs)
+            levels[level]["seconds"] += time.perf_counter() - start
+            return outputs
         
-        # Remove stopwords
-        stop_words = set(stopwords.words('english'))
-        filtered_tokens = [w for w in tokens if w.isalnum() and w not in stop_words and len(w) > 3]
+        async def push(level: int, summaries: List[str]):
+            while len(buffers) <= level:
+                buffers.append([])
+            buffers[level].extend(summaries)
+            groups = []
+            while len(buffers[level]) >= group_size:
+                groups.append(' '.join(buffers[level][:group_size]))
+                del buffers[level][:group_size]
+            if groups:
+                await push(level + 1, await run_level(level + 1, groups))
         
-        # Get word frequency
-        word_freq = {}
-        for word in filtered_tokens:
-            word_freq[word] = word_freq.get(word, 0) + 1
+        async for batch in windows:
+            await push(0, await run_level(0, batch))
         
-        # Sort by frequency and return top keywords
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        keywords = [word[0] for word in sorted_words[:num_keywords]]
+        # Flush partial groups upwards until a single summary remains
+        final_summary = ""
+        level = 0
+        while level < len(buffers):
+            items = buffers[level]
+            buffers[level] = []
+            if items and not any(buffers[level + 1:]) and len(items) == 1:
+                final_summary = items[0]
+                break
+            if len(items) > 1:
+                items = await run_level(level + 1, [' '.join(items)])
+            if items:
+                await push(level + 1, items)
+            level += 1
         
-        return keywords
+        for timing in levels:
+            timing["seconds"] = round(timing["seconds"], 3)
+        
+        return final_summary, levels
+    
+    def _map_window(self, length_params: dict) -> int:
+        return max(self._reduce_group_size(length_params), settings.SUMMARY_BATCH_MAX_SIZE)
+    
+    def _reduce_group_size(self, length_params: dict) -> int:
+        """How many summaries can be joined into one reduce input without overflowing the window"""
+        fits = self.chunker.budget // length_params["max_length"]
+        return max(2, min(settings.SUMMARY_REDUCE_GROUP_SIZE, fits))
+    
+    def _prepare(self, document: Document, length: str) -> Tuple[List[str], dict, Dict]:
+        with stage("preprocess"):
+            text = document.text
+        checkpoint()
+        
+        # Get length parameters
+        length_params = settings.SUMMARY_LENGTHS.get(length, settings.SUMMARY_LENGTHS["medium"])
+        
+        # Pack whole sentences into chunks that fill the model's token window
+        with stage("chunking"):
+            spans = document.chunk_spans(self.chunker)
+            chunks = [text[start:end] for start, end, _ in spans]
+            chunk_stats = self.chunker.stats(spans)
+        record_chunks(len(chunks))
+        return chunks, length_params, chunk_stats
+    
+    def _needs_second_pass(self, summary: str, length_params: dict) -> bool:
+        return len(summary.split()) > length_params["max_length"] * 1.5
+    
+    def _summarize_batch(self, chunks: List[str], length_params: dict) -> List[str]:
+        """Run the summarization pipeline over several chunks in one call"""
+        outputs = self.summarizer(
+            chunks,
+            max_length=length_params["max_length"],
+            min_length=length_params["min_length"],
+            do_sample=False,
+            truncation=True,
+            batch_size=min(len(chunks), settings.SUMMARY_BATCH_MAX_SIZE)
+        )
+        return [output['summary_text'] for output in outputs]
+    
+    def _process_batch(self, chunks: List[str], group: tuple) -> List[str]:
+        # Runs on the batcher's thread, outside any one request, so it feeds
+        # the process-wide model histograms rather than a request stage
+        start = time.perf_counter()
+        summaries = self._summarize_batch(chunks, dict(group))
+        MODEL_BATCH_SECONDS.observe(time.perf_counter() - start)
+        MODEL_BATCH_SIZE.observe(len(chunks))
+        return summaries
+    
+    def extract_keywords(self, text: str, num_keywords: int = 5) -> List[str]:
+        """Extract keywords from text"""
+        with stage("keywords"):
+            return keyword_engine.extract(text, num_keywords)
@@ -0,0 +1,65 @@
+"""
+Export the models into a local, versioned snapshot for fast offline starts.
+
+A snapshot holds the summarizer weights as safetensors (memory-mapped when
+loaded, instead of unpickled), its tokenizer, and the spaCy pipeline, plus
+a manifest with the model names, library versions and file checksums.
+Each export gets its own directory under MODEL_SNAPSHOT_DIR (default
+MODEL_CACHE_DIR/snapshots) and becomes the current snapshot once it is
+complete; the service then loads from it without any hub lookups.
+
+Run from the python-service directory:
+    python snapshot.py export            # new snapshot from the local model caches
+    python snapshot.py list
+    python snapshot.py use 20240101-120000
+    python snapshot.py remove 20231201-090000
+"""
+import argparse
+import json
+import os
+import sys
+
+from services import snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="snapshot root (default: MODEL_SNAPSHOT_DIR or MODEL_CACHE_DIR/snapshots)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="export the models into a new snapshot and make it current")
+    export.add_argument("--name", help="snapshot name (default: a timestamp)")
+    export.add_argument("--only", choices=snapshot.COMPONENTS, action="append",
+                        help="export only this component (repeatable)")
+    commands.add_parser("list", help="list snapshots, marking the current one")
+    use = commands.add_parser("use", help="make an existing snapshot current")
+    use.add_argument("name")
+    remove = commands.add_parser("remove", help="delete a snapshot that is not current")
+    remove.add_argument("name")
+    args = parser.parse_args()
+
+    root = args.dir or snapshot.snapshot_root()
+    try:
+        if args.command == "export":
+            path = snapshot.export_snapshot(root, args.name, args.only or snapshot.COMPONENTS)
+            manifest = snapshot.read_manifest(path)
+            size = sum(file["size"] for component in manifest["components"].values() for file in component["files"])
+            state = "now current" if snapshot.current_snapshot(root) == os.path.basename(path) else "not current"
+            print(f"Exported {', '.join(manifest['components'])} to {path} ({size / 1024 / 1024:.0f} MB), {state}")
+        elif args.command == "list":
+            current = snapshot.current_snapshot(root)
+            for name in snapshot.list_snapshots(root):
+                manifest = snapshot.read_manifest(os.path.join(root, name))
+                models = {component: entry["model"] for component, entry in manifest["components"].items()}
+                print(f"{'*' if name == current else ' '} {name}  {json.dumps(models)}")
+        elif args.command == "use":
+            snapshot.set_current(args.name, root)
+            print(f"Current snapshot is now {args.name}")
+        elif args.command == "remove":
+            snapshot.remove_snapshot(args.name, root)
+            print(f"Removed snapshot {args.name}")
+    except (ValueError, FileNotFoundError, FileExistsError) as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
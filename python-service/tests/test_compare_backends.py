@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from benchmarks.tiny_model import save_tiny_bart
+from services import inference_backend
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES = os.path.join(SERVICE_DIR, "benchmarks", "samples")
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tiny-bart"))
+    save_tiny_bart(path, SAMPLES)
+    return path
+
+
+def test_bf16_fallback_keeps_stdout_clean(tiny_model, monkeypatch, capsys):
+    from transformers import AutoModelForSeq2SeqLM
+
+    monkeypatch.setattr(inference_backend, "cpu_supports_bf16", lambda: False)
+    model, backend = inference_backend.apply_backend(AutoModelForSeq2SeqLM.from_pretrained(tiny_model), "bf16")
+    captured = capsys.readouterr()
+    assert backend == "fp32"
+    assert captured.out == ""
+    assert "bf16" in captured.err
+
+
+def test_compare_backends_runs_offline(tiny_model, tmp_path):
+    report = tmp_path / "report.json"
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.compare_backends", "--model", tiny_model, "--corpus", SAMPLES,
+         "--max-length", "20", "--min-length", "5", "--json", str(report)],
+        cwd=SERVICE_DIR, env=dict(os.environ, HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1"),
+        check=True, capture_output=True, text=True,
+    )
+    rows = {row["backend"]: row for row in json.loads(report.read_text())}
+    assert set(rows) == set(inference_backend.BACKENDS)
+    for row in rows.values():
+        assert row["mean_latency_s"] > 0
+        assert 0.0 <= row["rouge1"] <= 1.0
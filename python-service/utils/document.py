@@ -0,0 +1,96 @@
+import re
+from array import array
+from typing import Iterator, List, Optional, Tuple, Union
+
+WHITESPACE = re.compile(r'\s+')
+SPECIAL_CHARS = re.compile(r'[^\w\s\.\,\!\?\-]')
+# A sentence runs up to terminal punctuation followed by whitespace (or the end of the text)
+SENTENCE_PATTERN = re.compile(r'\S.*?(?:[.!?]+(?=\s|$)|$)', re.S)
+
+
+def normalize(text: str) -> str:
+    """Collapse whitespace and drop special characters, keeping basic punctuation"""
+    text = WHITESPACE.sub(' ', text)
+    text = SPECIAL_CHARS.sub('', text)
+    return text.strip()
+
+
+class Document:
+    """
+    The text of one request, shared by every stage that processes it.
+
+    The normalized text is built once, on first use, and the sentence and
+    chunk tables hold (start, end) offsets into it in flat integer arrays,
+    so stages slice the one string they need instead of each keeping their
+    own cleaned copy or list of sentence strings.
+    """
+    __slots__ = ("raw", "_text", "_word_count", "_sentence_offsets", "_chunk_offsets", "_chunk_key")
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self._text: Optional[str] = None
+        self._word_count: Optional[int] = None
+        self._sentence_offsets: Optional[array] = None
+        self._chunk_offsets: Optional[array] = None
+        self._chunk_key = None
+
+    @classmethod
+    def of(cls, text: Union[str, "Document"]) -> "Document":
+        return text if isinstance(text, Document) else cls(text)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            collapsed = WHITESPACE.sub(' ', self.raw).strip()
+            # Whitespace is now single spaces, so counting them counts the
+            # words of the raw text (as len(raw.split()) would) without a list
+            self._word_count = collapsed.count(' ') + 1 if collapsed else 0
+            self._text = SPECIAL_CHARS.sub('', collapsed).strip()
+        return self._text
+
+    @property
+    def word_count(self) -> int:
+        """Number of whitespace-separated words in the raw text"""
+        if self._word_count is None:
+            self.text
+        return self._word_count
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self._sentences()) // 2
+
+    def sentence_spans(self) -> Iterator[Tuple[int, int]]:
+        offsets = self._sentences()
+        for i in range(0, len(offsets), 2):
+            yield offsets[i], offsets[i + 1]
+
+    def sentence(self, index: int) -> str:
+        offsets = self._sentences()
+        return self.text[offsets[2 * index]:offsets[2 * index + 1]]
+
+    def chunk_spans(self, chunker) -> List[Tuple[int, int, int]]:
+        """(start, end, token_count) of each model-sized chunk, computed once per chunker setup"""
+        key = (id(chunker.tokenizer), chunker.budget, chunker.overlap_sentences)
+        if self._chunk_offsets is None or self._chunk_key != key:
+            offsets = array("q")
+            for span in chunker.chunk_spans(self.text, self.sentence_spans()):
+                offsets.extend(span)
+            self._chunk_offsets = offsets
+            self._chunk_key = key
+        offsets = self._chunk_offsets
+        return [(offsets[i], offsets[i + 1], offsets[i + 2]) for i in range(0, len(offsets), 3)]
+
+    def _sentences(self) -> array:
+        if self._sentence_offsets is None:
+            offsets = array("q")
+            for match in SENTENCE_PATTERN.finditer(self.text):
+                offsets.append(match.start())
+                offsets.append(match.end())
+            self._sentence_offsets = offsets
+        return self._sentence_offsets
+
+
+def word_count(text: str) -> int:
+    """len(text.split()) without building the list of words"""
+    collapsed = WHITESPACE.sub(' ', text).strip()
+    return collapsed.count(' ') + 1 if collapsed else 0
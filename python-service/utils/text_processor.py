@@ -1,29 +1,29 @@
 import re
-import nltk
 from typing import List, Dict
 from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import stopwords
+from services.keyword_engine import keyword_engine
+from services.model_registry import require_nltk_data
+from utils.document import WHITESPACE, word_count
+
+CLEAN_SPECIAL_CHARS = re.compile(r'[^\w\s\.\,\!\?\-\:\;]')
+SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([.!?,])')
 
 class TextProcessor:
     def __init__(self):
-        # Download required NLTK data
-        try:
-            nltk.download('punkt', quiet=True)
-            nltk.download('stopwords', quiet=True)
-            nltk.download('wordnet', quiet=True)
-        except:
-            pass
+        # Required NLTK data must be installed ahead of time
+        require_nltk_data("tokenizers/punkt", "corpora/stopwords")
         
         self.stop_words = set(stopwords.words('english'))
     
     def clean_text(self, text: str) -> str:
         """Clean and normalize text"""
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = WHITESPACE.sub(' ', text)
         # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s\.\,\!\?\-\:\;]', '', text)
+        text = CLEAN_SPECIAL_CHARS.sub('', text)
         # Fix spacing around punctuation
-        text = re.sub(r'\s+([.!?,])', r'\1', text)
+        text = SPACE_BEFORE_PUNCTUATION.sub(r'\1', text)
         return text.strip()
     
     def extract_sentences(self, text: str) -> List[str]:
@@ -33,25 +33,7 @@ class TextProcessor:
     
     def extract_keywords(self, text: str, num_keywords: int = 10) -> List[str]:
         """Extract keywords from text"""
-        text = self.clean_text(text.lower())
-        tokens = word_tokenize(text)
-        
-        # Filter tokens
-        filtered_tokens = [
-            token for token in tokens 
-            if token.isalnum() and 
-            token not in self.stop_words and 
-            len(token) > 3
-        ]
-        
-        # Count frequency
-        word_freq = {}
-        for word in filtered_tokens:
-            word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # Sort by frequency
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        return [word[0] for word in sorted_words[:num_keywords]]
+        return keyword_engine.extract(text, num_keywords)
     
     def chunk_text(self, text: str, chunk_size: int = 500) -> List[str]:
         """Split text into chunks"""
@@ -61,7 +43,7 @@ class TextProcessor:
         current_size = 0
         
         for sentence in sentences:
-            sentence_size = len(sentence.split())
+            sentence_size = word_count(sentence)
             if current_size + sentence_size > chunk_size and current_chunk:
                 chunks.append(' '.join(current_chunk))
                 current_chunk = [sentence]
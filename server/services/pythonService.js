@@ -2,20 +2,38 @@ const axios = require('axios');
 
 const PYTHON_SERVICE_URL = process.env.PYTHON_SERVICE_URL || 'http://localhost:8000';
 
+const PYTHON_SERVICE_TIMEOUT_MS = 30000;
+
 const pythonAPI = axios.create({
   baseURL: PYTHON_SERVICE_URL,
-  timeout: 30000,
+  timeout: PYTHON_SERVICE_TIMEOUT_MS,
   headers: {
-    'Content-Type': 'application/json'
+    'Content-Type': 'application/json',
+    // Lets the Python service stop work we will no longer wait for
+    'X-Request-Deadline-Ms': String(PYTHON_SERVICE_TIMEOUT_MS)
   }
 });
 
+// The service answers in snake_case; the frontend reads correctAnswer
+function toClientQuestion(q) {
+  return {
+    question: q.question,
+    type: q.type,
+    options: q.options,
+    correctAnswer: q.correct_answer || q.correctAnswer, // Handle both formats
+    explanation: q.explanation
+  };
+}
+
 const pythonService = {
-  async generateSummary(text, length = 'medium') {
+  // Pass mode 'auto' to let the service answer with a fast extractive summary
+  // for short texts or when the abstractive model is backed up
+  async generateSummary(text, length = 'medium', mode = 'standard') {
     try {
       const response = await pythonAPI.post('/api/summarize', {
         text,
-        length
+        length,
+        mode
       });
       return response.data;
     } catch (error) {
@@ -40,13 +58,7 @@ const pythonService = {
       // Ensure correct field names
       const transformedData = {
         ...response.data,
-        questions: response.data.questions.map(q => ({
-          question: q.question,
-          type: q.type,
-          options: q.options,
-          correctAnswer: q.correct_answer || q.correctAnswer, // Handle both formats
-          explanation: q.explanation
-        }))
+        questions: response.data.questions.map(toClientQuestion)
       };
       
       return transformedData;
@@ -103,7 +115,74 @@ const pythonService = {
         ]
       };
     }
+  },
+
+  // Summary, quiz, flashcards and keywords in one request: the service parses
+  // the text once for all of them. Artifacts that fail are listed in errors.
+  async analyze(text, config = {}) {
+    const artifacts = config.artifacts || ['summary', 'quiz', 'flashcards', 'keywords'];
+    try {
+      const response = await pythonAPI.post('/api/analyze', {
+        text,
+        artifacts,
+        length: config.length || 'medium',
+        mode: config.mode || 'standard',
+        num_questions: config.numQuestions || 10,
+        difficulty: config.difficulty || 'medium',
+        question_types: config.questionTypes || ['multiple_choice', 'true_false'],
+        count: config.count || 10
+      });
+
+      const data = response.data;
+      if (data.quiz) {
+        data.quiz.questions = data.quiz.questions.map(toClientQuestion);
+      }
+      return data;
+    } catch (error) {
+      console.error('Python service error:', error.message);
+      const errors = {};
+      artifacts.forEach(name => { errors[name] = 'AI service temporarily unavailable'; });
+      return { summary: null, quiz: null, flashcards: null, keywords: null, errors };
+    }
+  },
+
+  // Batch variants: one request for many documents. Results come back per
+  // document ({ index, result, error }) so one bad document does not fail the rest.
+  async generateSummaryBatch(texts, length = 'medium') {
+    return batchRequest('/api/summarize/batch', texts, { texts, length });
+  },
+
+  async generateQuizBatch(texts, config = {}) {
+    const results = await batchRequest('/api/quiz/generate/batch', texts, {
+      texts,
+      num_questions: config.numQuestions || 10,
+      difficulty: config.difficulty || 'medium',
+      question_types: config.questionTypes || ['multiple_choice', 'true_false']
+    });
+    // Same question shape as generateQuiz for documents that succeeded
+    return results.map(item => (item.result ? {
+      ...item,
+      result: { ...item.result, questions: item.result.questions.map(toClientQuestion) }
+    } : item));
+  },
+
+  async generateFlashcardsBatch(texts, count = 10) {
+    return batchRequest('/api/flashcards/generate/batch', texts, { texts, count });
   }
 };
 
+async function batchRequest(url, texts, body) {
+  try {
+    const response = await pythonAPI.post(url, body);
+    return response.data.results;
+  } catch (error) {
+    console.error('Python service error:', error.message);
+    return texts.map((_, index) => ({
+      index,
+      result: null,
+      error: 'AI service temporarily unavailable'
+    }));
+  }
+}
+
 module.exports = pythonService;